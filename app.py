@@ -1,12 +1,20 @@
-from flask import Flask, render_template, request, redirect
+from flask import Flask, Response, render_template, request, redirect
 from flask_cors import CORS
-from config import PORT
+from config import supabase, PORT, LOG_ARCHIVE_ENABLED, METRICS_TOKEN
 from routes.auth_routes import auth_bp
 from routes.job_routes import jobs_bp
+from routes.webhook_routes import webhooks_bp
+from routes.runner_routes import runners_bp
+from services.job_runner import scheduler
+from services.log_archive import start_archiver
+from services.workspace_gc import start_workspace_gc
+from services import metrics, job_queue
 from dashboard import create_dashboard
 
 app = Flask(__name__)
 CORS(app)
+metrics.instrument_flask(app)
+metrics.instrument_db(supabase)
 
 # Integrate Dash dashboard into Flask app
 create_dashboard(app)
@@ -14,6 +22,14 @@ create_dashboard(app)
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(jobs_bp)
+app.register_blueprint(webhooks_bp)
+app.register_blueprint(runners_bp)
+
+# Start leasing queued jobs in this process (MAX_CONCURRENT_JOBS=0 leaves them to runner agents)
+scheduler.start()
+start_workspace_gc()
+if LOG_ARCHIVE_ENABLED:
+    start_archiver()
 
 @app.route('/')
 def index():
@@ -27,7 +43,18 @@ def auth_callback():
 
 @app.route('/health', methods=['GET'])
 def health():
-    return {'status': 'ok'}, 200
+    return {'status': 'ok', 'queue': scheduler.stats()}, 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return {'error': 'Unauthorized'}, 401
+    try:
+        metrics.QUEUE_DEPTH.set(job_queue.pending_count())
+    except Exception as e:
+        print(f"Failed to read queue depth: {e}")
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
 
 if __name__ == '__main__':
     import os
@@ -2,6 +2,8 @@
 CI Server Python Client Example
 Usage: python client_example.py
 """
+import json
+import time
 import requests
 
 BASE_URL = "http://localhost:5000/api"
@@ -39,24 +41,58 @@ class CIClient:
         return res.json()
     
     # Jobs
-    def create_job(self, repo_url, branch="main"):
+    def create_job(self, repo_url, branch="main", force=False, labels=None):
         res = requests.post(f"{self.base_url}/jobs",
-                           json={"repo_url": repo_url, "branch": branch},
+                           json={"repo_url": repo_url, "branch": branch, "force": force, "labels": labels or []},
                            headers=self._headers())
         return res.json()
     
-    def list_jobs(self):
-        res = requests.get(f"{self.base_url}/jobs", headers=self._headers())
+    def list_jobs(self, limit=None, cursor=None, status=None, fields=None):
+        params = {k: v for k, v in {"limit": limit, "cursor": cursor, "status": status, "fields": fields}.items() if v is not None}
+        res = requests.get(f"{self.base_url}/jobs", params=params, headers=self._headers())
         return res.json()
     
     def get_job(self, job_id):
         res = requests.get(f"{self.base_url}/jobs/{job_id}", headers=self._headers())
         return res.json()
     
-    def get_logs(self, job_id):
-        res = requests.get(f"{self.base_url}/jobs/{job_id}/logs", headers=self._headers())
+    def get_logs(self, job_id, after=None, limit=None, tail=None):
+        params = {k: v for k, v in {"after": after, "limit": limit, "tail": tail}.items() if v is not None}
+        res = requests.get(f"{self.base_url}/jobs/{job_id}/logs", params=params, headers=self._headers())
         return res.json()
     
+    def get_timings(self, job_id):
+        res = requests.get(f"{self.base_url}/jobs/{job_id}/timings", headers=self._headers())
+        return res.json()
+    
+    def stream_logs(self, job_id):
+        """Yield log lines as they are written, until the job finishes"""
+        last_id = None
+        while True:
+            headers = self._headers()
+            if last_id:
+                headers["Last-Event-ID"] = last_id
+            with requests.get(f"{self.base_url}/jobs/{job_id}/logs/stream",
+                              headers=headers, stream=True) as res:
+                if res.status_code == 503:
+                    # Server is at its stream limit
+                    time.sleep(int(res.headers.get("Retry-After", 5)))
+                    continue
+                res.raise_for_status()
+                event = {}
+                for line in res.iter_lines(decode_unicode=True):
+                    if line:
+                        field, _, value = line.partition(": ")
+                        event[field] = value
+                        continue
+                    if event.get("event") == "end":
+                        return
+                    if event.get("event") == "log":
+                        last_id = event.get("id", last_id)
+                        yield json.loads(event["data"])
+                    event = {}
+            # The server closes long streams; reconnect and resume
+    
     def cancel_job(self, job_id):
         res = requests.post(f"{self.base_url}/jobs/{job_id}/cancel", headers=self._headers())
         return res.json()
@@ -89,11 +125,8 @@ if __name__ == "__main__":
     for j in jobs:
         print(f"  {j['id'][:8]}... | {j['status']} | {j['repo_url']}")
     
-    # Get logs
+    # Stream logs until the job finishes
     if job.get("id"):
         print(f"\n=== Logs for {job['id'][:8]}... ===")
-        import time
-        time.sleep(3)  # Wait for some logs
-        logs = client.get_logs(job["id"])
-        for log in logs:
+        for log in client.stream_logs(job["id"]):
             print(f"  [{log['level']}] {log['message']}")
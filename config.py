@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from supabase import create_client
+from storage import connect
 
 # Load .env from the same directory as this file
 env_path = Path(__file__).parent / '.env'
@@ -13,4 +13,124 @@ JWT_SECRET = os.getenv('JWT_SECRET', 'change-this-secret')
 PORT = int(os.getenv('PORT', 5000))
 WORKSPACE_DIR = os.getenv('WORKSPACE_DIR', './workspaces')
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Database: 'supabase' (PostgREST over HTTPS), 'postgres' (pooled direct connection
+# to DATABASE_URL) or 'sqlite' (embedded file, for local runs and benchmarks)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'supabase')
+DATABASE_URL = os.getenv('DATABASE_URL')
+SQLITE_PATH = os.getenv('SQLITE_PATH', './ci.db')
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_KEEPALIVE_SECONDS = float(os.getenv('DB_KEEPALIVE_SECONDS', 60))
+# Threads for issuing independent queries at once (storage.concurrent)
+DB_CONCURRENCY = int(os.getenv('DB_CONCURRENCY', DB_POOL_MAX))
+
+# Named for the original backend; every module queries through it whichever is chosen
+supabase = connect(STORAGE_BACKEND, SUPABASE_URL, SUPABASE_KEY, DATABASE_URL, SQLITE_PATH,
+                   DB_POOL_MIN, DB_POOL_MAX, DB_KEEPALIVE_SECONDS, DB_CONCURRENCY)
+
+# Job log buffering
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 200))
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 0.5))
+LOG_BUFFER_LIMIT = int(os.getenv('LOG_BUFFER_LIMIT', 5000))
+LOG_FLUSH_RETRIES = int(os.getenv('LOG_FLUSH_RETRIES', 3))
+
+# Job scheduling
+MAX_CONCURRENT_JOBS = int(os.getenv('MAX_CONCURRENT_JOBS', os.cpu_count() or 2))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 60))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', 15))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 5))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_KILL_GRACE_SECONDS = float(os.getenv('JOB_KILL_GRACE_SECONDS', 10))
+# Once a job too big for a runner's free capacity has waited this long, the runner stops
+# taking newer jobs until it fits (0 disables, letting small jobs starve big ones)
+JOB_STARVATION_SECONDS = int(os.getenv('JOB_STARVATION_SECONDS', 300))
+
+def _host_memory_mb():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 1024 ** 2
+    except (AttributeError, ValueError, OSError):
+        return 4096
+
+# Resources this host offers to jobs, and what a job gets when it doesn't say
+HOST_CPUS = float(os.getenv('HOST_CPUS', os.cpu_count() or 2))
+HOST_MEMORY_MB = int(os.getenv('HOST_MEMORY_MB', _host_memory_mb()))
+JOB_DEFAULT_CPUS = float(os.getenv('JOB_DEFAULT_CPUS', 1))
+JOB_DEFAULT_MEMORY_MB = int(os.getenv('JOB_DEFAULT_MEMORY_MB', 2048))
+# Delegated cgroup v2 directory to create per-job cgroups in; unset falls back to rlimits
+JOB_CGROUP_ROOT = os.getenv('JOB_CGROUP_ROOT')
+
+# Shared bare mirrors used to materialise job workspaces
+GIT_MIRROR_CACHE = os.getenv('GIT_MIRROR_CACHE', 'true').lower() == 'true'
+GIT_MIRROR_DIR = os.getenv('GIT_MIRROR_DIR', './git-mirrors')
+GIT_MIRROR_MAX_BYTES = int(os.getenv('GIT_MIRROR_MAX_BYTES', 5 * 1024 ** 3))
+GIT_MIRROR_EVICT_INTERVAL = float(os.getenv('GIT_MIRROR_EVICT_INTERVAL', 600))
+
+# Persistent package manager caches shared by all jobs
+DEP_CACHE_ENABLED = os.getenv('DEP_CACHE_ENABLED', 'true').lower() == 'true'
+DEP_CACHE_DIR = os.path.abspath(os.getenv('DEP_CACHE_DIR', './dep-cache'))
+DEP_CACHE_MAX_BYTES = int(os.getenv('DEP_CACHE_MAX_BYTES', 10 * 1024 ** 3))
+DEP_CACHE_EVICT_INTERVAL = float(os.getenv('DEP_CACHE_EVICT_INTERVAL', 600))
+JOB_MAX_PARALLEL_STEPS = int(os.getenv('JOB_MAX_PARALLEL_STEPS', 4))
+
+# Server-sent log streams
+LOG_STREAM_POLL_INTERVAL = float(os.getenv('LOG_STREAM_POLL_INTERVAL', 1))
+LOG_STREAM_KEEPALIVE = float(os.getenv('LOG_STREAM_KEEPALIVE', 15))
+# Each open stream holds a gunicorn thread; keep this well under GUNICORN_THREADS
+LOG_STREAM_MAX_CONCURRENT = int(os.getenv('LOG_STREAM_MAX_CONCURRENT', 8))
+LOG_STREAM_MAX_SECONDS = float(os.getenv('LOG_STREAM_MAX_SECONDS', 120))
+LOG_STREAM_RETRY_AFTER = int(os.getenv('LOG_STREAM_RETRY_AFTER', 5))
+LOG_PAGE_DEFAULT = int(os.getenv('LOG_PAGE_DEFAULT', 1000))
+LOG_PAGE_MAX = int(os.getenv('LOG_PAGE_MAX', 5000))
+JOBS_PAGE_DEFAULT = int(os.getenv('JOBS_PAGE_DEFAULT', 50))
+JOBS_PAGE_MAX = int(os.getenv('JOBS_PAGE_MAX', 200))
+
+# Compaction of finished jobs' logs into compressed chunks
+LOG_ARCHIVE_ENABLED = os.getenv('LOG_ARCHIVE_ENABLED', 'true').lower() == 'true'
+LOG_ARCHIVE_AFTER = float(os.getenv('LOG_ARCHIVE_AFTER', 3600))
+LOG_ARCHIVE_INTERVAL = float(os.getenv('LOG_ARCHIVE_INTERVAL', 300))
+LOG_ARCHIVE_CHUNK_LINES = int(os.getenv('LOG_ARCHIVE_CHUNK_LINES', 1000))
+
+# Rendered dashboard cache, keyed on the data version that job inserts, status changes and
+# deletes bump. Log lines and step timings don't bump it (they are written far too often),
+# so the live log feed and Time by Stage chart can lag by up to DASHBOARD_CACHE_TTL seconds
+DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', 30))
+DASHBOARD_CACHE_SIZE = int(os.getenv('DASHBOARD_CACHE_SIZE', 256))
+
+# Pushes to one branch within this window are coalesced into a single build
+WEBHOOK_DEBOUNCE_SECONDS = float(os.getenv('WEBHOOK_DEBOUNCE_SECONDS', 10))
+
+# Skip pipelines whose commit already built successfully with the same steps
+BUILD_CACHE_ENABLED = os.getenv('BUILD_CACHE_ENABLED', 'true').lower() == 'true'
+
+# Opt-in pool of warm checkouts per repo/branch, reset between jobs instead of recloned
+WORKSPACE_POOL_ENABLED = os.getenv('WORKSPACE_POOL_ENABLED', 'false').lower() == 'true'
+WORKSPACE_POOL_DIR = os.getenv('WORKSPACE_POOL_DIR', './workspace-pool')
+WORKSPACE_POOL_SIZE = int(os.getenv('WORKSPACE_POOL_SIZE', 8))
+# Untracked build outputs kept between jobs so incremental builds stay incremental
+WORKSPACE_POOL_PRESERVE = [d.strip() for d in os.getenv(
+    'WORKSPACE_POOL_PRESERVE', 'target,build,.gradle,node_modules,.venv').split(',') if d.strip()]
+
+# Background cleanup of WORKSPACE_DIR; new jobs wait while it and WORKSPACE_POOL_DIR together
+# are over quota (0 = no quota)
+WORKSPACE_MAX_BYTES = int(os.getenv('WORKSPACE_MAX_BYTES', 20 * 1024 ** 3))
+WORKSPACE_GC_INTERVAL = float(os.getenv('WORKSPACE_GC_INTERVAL', 300))
+WORKSPACE_GC_MIN_AGE = float(os.getenv('WORKSPACE_GC_MIN_AGE', 120))
+
+# Bearer token required by /metrics (unset = open, e.g. behind a private network)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Runner agents (runner_agent.py) that lease jobs over HTTP; unset token disables /api/runners
+RUNNER_TOKEN = os.getenv('RUNNER_TOKEN')
+RUNNER_LONG_POLL_SECONDS = float(os.getenv('RUNNER_LONG_POLL_SECONDS', 25))
+# Long-polls waiting at once per web process, each holding a gunicorn thread; past this a
+# lease request checks the queue once and returns (agents then poll every JOB_POLL_INTERVAL)
+RUNNER_MAX_LONG_POLLS = int(os.getenv('RUNNER_MAX_LONG_POLLS', 8))
+# Agents not heard from for this long no longer count when sizing new jobs
+RUNNER_OFFLINE_AFTER = float(os.getenv('RUNNER_OFFLINE_AFTER', 300))
+# Labels this process's runners offer (e.g. python,node,large); jobs only go to runners that
+# have every label they ask for. Unset: only unlabelled jobs; '*': the in-process runner takes any job
+RUNNER_LABELS = None if os.getenv('RUNNER_LABELS', '').strip() == '*' else \
+    [label.strip() for label in os.getenv('RUNNER_LABELS', '').split(',') if label.strip()]
+# Where a runner agent finds the server, and the name it registers under
+CI_SERVER_URL = os.getenv('CI_SERVER_URL', 'http://localhost:5000')
+RUNNER_NAME = os.getenv('RUNNER_NAME')
@@ -7,14 +7,20 @@ from dash import dcc, html, Input, Output, callback, ctx
 import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime
-from config import supabase
+from config import supabase, DASHBOARD_CACHE_TTL, DASHBOARD_CACHE_SIZE
 from auth import decode_token
+from services.analytics import merge_histograms, histogram_quantile
+from services.cache import SingleFlightCache
+from storage import concurrent
 from urllib.parse import parse_qs
 
 # Will be set when integrated with Flask
 dash_app = None
 current_user_id = None
 
+# Rendered outputs keyed by (user_id, data version)
+render_cache = SingleFlightCache(DASHBOARD_CACHE_SIZE, DASHBOARD_CACHE_TTL)
+
 # Light Theme
 THEME = {
     'bg': '#f8fafc', 'card': '#ffffff', 'card_border': '#e2e8f0',
@@ -23,41 +29,97 @@ THEME = {
     'text': '#1e293b', 'text_dim': '#64748b', 'border': '#e2e8f0',
 }
 
-def fetch_jobs(user_id=None):
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Only the columns the dashboard reads, so wide rows never cross the wire
+JOB_COLUMNS = ['id', 'repo_url', 'branch', 'status', 'created_at', 'started_at', 'finished_at']
+ROLLUP_COLUMNS = ['day', 'hour', 'status', 'repo_url', 'job_count', 'duration_count', 'duration_sum', 'duration_hist']
+
+def fetch_jobs(user_id=None, limit=None):
     # Fetch jobs for specific user if user_id provided
-    query = supabase.table('jobs').select('*').order('created_at', desc=True)
+    query = supabase.table('jobs').select(', '.join(JOB_COLUMNS)).order('created_at', desc=True)
     if user_id:
         query = query.eq('user_id', user_id)
+    if limit:
+        query = query.limit(limit)
     result = query.execute()
-    if result.data:
-        df = pd.DataFrame(result.data)
-        df['created_at'] = pd.to_datetime(df['created_at'])
-        df['started_at'] = pd.to_datetime(df['started_at'])
-        df['finished_at'] = pd.to_datetime(df['finished_at'])
-        df['date'] = df['created_at'].dt.date
-        df['hour'] = df['created_at'].dt.hour
-        df['day_name'] = df['created_at'].dt.day_name()
-        df['duration'] = (df['finished_at'] - df['started_at']).dt.total_seconds()
-        return df
-    return pd.DataFrame()
+    
+    df = pd.DataFrame.from_records(result.data or [], columns=JOB_COLUMNS)
+    for col in ['created_at', 'started_at', 'finished_at']:
+        df[col] = pd.to_datetime(df[col], utc=True, format='ISO8601')
+    for col in ['repo_url', 'branch', 'status']:
+        df[col] = df[col].astype('category')
+    df['date'] = df['created_at'].dt.normalize()
+    df['hour'] = df['created_at'].dt.hour.astype('int8')
+    df['day_name'] = pd.Categorical(df['created_at'].dt.day_name(), categories=DAYS_ORDER)
+    df['duration'] = (df['finished_at'] - df['started_at']).dt.total_seconds()
+    return df
 
-def fetch_logs(user_id=None):
+def fetch_rollups(user_id=None):
+    # Pre-aggregated per day/hour/status/repo counts, maintained as jobs finish
+    query = supabase.table('job_rollups').select(', '.join(ROLLUP_COLUMNS))
     if user_id:
-        # Get logs only for this user's jobs
-        jobs_result = supabase.table('jobs').select('id').eq('user_id', user_id).execute()
-        if jobs_result.data:
-            job_ids = [job['id'] for job in jobs_result.data]
-            result = supabase.table('job_logs').select('*').in_('job_id', job_ids).order('created_at', desc=True).limit(50).execute()
-        else:
-            result = type('obj', (object,), {'data': []})()
-    else:
-        result = supabase.table('job_logs').select('*').order('created_at', desc=True).limit(50).execute()
-    return pd.DataFrame(result.data) if result.data else pd.DataFrame()
+        query = query.eq('user_id', user_id)
+    result = query.execute()
+    
+    df = pd.DataFrame.from_records(result.data or [], columns=ROLLUP_COLUMNS)
+    df['date'] = pd.to_datetime(df['day'], format='%Y-%m-%d')
+    df['day_name'] = pd.Categorical(df['date'].dt.day_name(), categories=DAYS_ORDER)
+    df['hour'] = df['hour'].astype('int8')
+    for col in ['status', 'repo_url']:
+        df[col] = df[col].astype('category')
+    for col in ['job_count', 'duration_count']:
+        df[col] = df[col].astype('int64')
+    df['duration_sum'] = df['duration_sum'].astype('float64')
+    return df.drop(columns=['day'])
+
+def fetch_active_counts(user_id=None):
+    # Pending and running jobs are not in the rollups yet
+    counts = {}
+    for status in ['pending', 'running']:
+        query = supabase.table('jobs').select('id', count='exact', head=True).eq('status', status)
+        if user_id:
+            query = query.eq('user_id', user_id)
+        counts[status] = query.execute().count or 0
+    return counts
 
-def fetch_users():
-    result = supabase.table('users').select('*').execute()
+def fetch_data_version(user_id=None):
+    # Bumped by a trigger whenever the user's jobs are created, change status or are deleted
+    if not user_id:
+        # Every bump adds one to some user's row, so the sum changes whenever any of them does
+        result = supabase.table('data_versions').select('version').execute()
+        return sum(row['version'] for row in result.data or [])
+    result = supabase.table('data_versions').select('version').eq('scope', user_id).execute()
+    return result.data[0]['version'] if result.data else 0
+
+def fetch_logs(user_id=None, limit=50):
+    # job_logs carries its job's owner, so this is one index range scan however many jobs a user has
+    query = supabase.table('job_logs').select('message, level, created_at').order('created_at', desc=True).limit(limit)
+    if user_id:
+        query = query.eq('user_id', user_id)
+    result = query.execute()
     return pd.DataFrame(result.data) if result.data else pd.DataFrame()
 
+STAGE_KINDS = ['queue', 'clone', 'config', 'deps', 'command', 'cleanup']
+
+def fetch_stage_times(user_id=None, limit=5000):
+    # Most recent job_steps spans, to show where build time goes per repository
+    query = supabase.table('job_steps').select('job_id, repo_url, kind, duration_ms')\
+        .order('started_at', desc=True).limit(limit)
+    if user_id:
+        query = query.eq('user_id', user_id)
+    result = query.execute()
+    
+    df = pd.DataFrame.from_records(result.data or [], columns=['job_id', 'repo_url', 'kind', 'duration_ms'])
+    df['kind'] = pd.Categorical(df['kind'], categories=STAGE_KINDS)
+    df['duration_ms'] = df['duration_ms'].astype('int64')
+    return df
+
+def fetch_user_count():
+    # Count on the server instead of pulling every user row (and password hash)
+    result = supabase.table('users').select('id', count='exact', head=True).execute()
+    return result.count or 0
+
 def create_dashboard(flask_app):
     """Create and integrate Dash dashboard with Flask app"""
     global dash_app
@@ -148,6 +210,10 @@ def create_dashboard(flask_app):
             html.Div("Success vs Failure Trend", style={'fontSize': '14px', 'fontWeight': '600', 'marginBottom': '16px', 'color': THEME['text']}),
             dcc.Graph(id='trend-chart', config={'displayModeBar': False}, style={'height': '200px'})
         ], className='card', style={'padding': '20px', 'flex': '1', 'minHeight': '260px'}),
+        html.Div([
+            html.Div("Time by Stage", style={'fontSize': '14px', 'fontWeight': '600', 'marginBottom': '16px', 'color': THEME['text']}),
+            dcc.Graph(id='stage-chart', config={'displayModeBar': False}, style={'height': '200px'})
+        ], className='card', style={'padding': '20px', 'flex': '1', 'minHeight': '260px'}),
     ], style={'display': 'flex', 'gap': '16px', 'padding': '0 32px 16px'}),
     
     # Row 4
@@ -178,7 +244,7 @@ def register_callbacks(app):
     @app.callback(
         [Output('kpi-cards', 'children'), Output('throughput-chart', 'figure'), Output('status-pie', 'figure'),
          Output('heatmap-chart', 'figure'), Output('duration-chart', 'figure'), Output('hourly-chart', 'figure'),
-         Output('repo-chart', 'figure'), Output('trend-chart', 'figure'),
+         Output('repo-chart', 'figure'), Output('trend-chart', 'figure'), Output('stage-chart', 'figure'),
          Output('jobs-table', 'children'), Output('logs-feed', 'children')],
         [Input('main-container', 'id')],
         prevent_initial_call=False
@@ -198,130 +264,173 @@ def register_callbacks(app):
         except:
             user_id = current_user_id
         
-        df = fetch_jobs(user_id)
-        logs = fetch_logs(user_id)
-        users = fetch_users()
-        
-        def empty_fig(h=200):
-            fig = go.Figure()
-            fig.add_annotation(text='No data available', x=0.5, y=0.5, xref='paper', yref='paper',
-                              showarrow=False, font=dict(size=14, color=THEME['text_dim']))
-            fig.update_layout(
-                paper_bgcolor='#fff', plot_bgcolor='#fff', height=h, 
-                margin=dict(l=20, r=20, t=20, b=20),
-                xaxis=dict(visible=False, showgrid=False),
-                yaxis=dict(visible=False, showgrid=False)
-            )
-            return fig
-        
-        if df.empty:
-            kpis = [kpi_card("Total Jobs", 0, THEME['accent']), kpi_card("Success Rate", "0%", THEME['success']),
-                    kpi_card("Failed", 0, THEME['error']), kpi_card("Running", 0, THEME['info']),
-                    kpi_card("Avg Duration", "0s", THEME['warning']), kpi_card("Users", len(users), THEME['accent2'])]
-            return kpis, empty_fig(220), empty_fig(220), empty_fig(200), empty_fig(200), empty_fig(200), empty_fig(200), empty_fig(200), \
-                   html.P("No jobs yet - create a pipeline to see data here", style={'color': THEME['text_dim'], 'textAlign': 'center', 'padding': '40px'}), \
-                   html.P("No logs yet", style={'color': THEME['text_dim'], 'textAlign': 'center', 'padding': '40px'})
-        
-        # Stats
-        total = len(df)
-        success = len(df[df['status'] == 'success'])
-        failed = len(df[df['status'] == 'failed'])
-        running = len(df[df['status'] == 'running'])
-        rate = f"{success/total*100:.0f}%" if total else "0%"
-        avg_dur = f"{df['duration'].dropna().mean():.0f}s" if df['duration'].notna().any() else "0s"
-        
-        kpis = [kpi_card("Total Jobs", total, THEME['accent']), kpi_card("Success Rate", rate, THEME['success']),
-                kpi_card("Failed", failed, THEME['error']), kpi_card("Running", running, THEME['info']),
-                kpi_card("Avg Duration", avg_dur, THEME['warning']), kpi_card("Users", len(users), THEME['accent2'])]
-        
-        # 1. Throughput Area
-        daily = df.groupby('date').size().reset_index(name='count')
-        throughput = go.Figure()
-        throughput.add_trace(go.Scatter(x=daily['date'], y=daily['count'], mode='lines', fill='tozeroy',
-                                        line=dict(color=THEME['accent'], width=2), fillcolor='rgba(99,102,241,0.1)'))
-        throughput.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=220, margin=dict(l=40,r=20,t=10,b=40),
-                                xaxis=dict(showgrid=False, tickfont=dict(size=11, color=THEME['text_dim'])),
-                                yaxis=dict(showgrid=True, gridcolor='#f1f5f9', tickfont=dict(size=11, color=THEME['text_dim'])),
-                                uirevision='constant')
-        
-        # 2. Status Pie
-        status_counts = df['status'].value_counts()
-        colors_map = {'success': THEME['success'], 'failed': THEME['error'], 'running': THEME['info'], 
-                      'pending': THEME['text_dim'], 'cancelled': THEME['warning']}
-        status_pie = go.Figure(go.Pie(values=status_counts.values, labels=status_counts.index, hole=0.5,
-                                      marker=dict(colors=[colors_map.get(s, THEME['text_dim']) for s in status_counts.index]),
-                                      textinfo='percent', textfont=dict(size=12, color='#fff')))
-        status_pie.update_layout(paper_bgcolor='#fff', height=220, margin=dict(l=20,r=20,t=10,b=10),
-                                legend=dict(orientation='h', y=-0.1, font=dict(size=11, color=THEME['text_dim'])),
-                                uirevision='constant')
-        
-        # 3. Heatmap
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        heatmap_data = df.groupby(['day_name', 'hour']).size().unstack(fill_value=0).reindex(days_order, fill_value=0)
-        heatmap = go.Figure(go.Heatmap(z=heatmap_data.values, x=list(range(24)), y=['Mon','Tue','Wed','Thu','Fri','Sat','Sun'],
-                                       colorscale=[[0, '#f1f5f9'], [0.5, '#a5b4fc'], [1, THEME['accent']]], showscale=False))
-        heatmap.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=40,r=20,t=10,b=30),
-                             xaxis=dict(tickfont=dict(size=10, color=THEME['text_dim']), dtick=4),
-                             yaxis=dict(tickfont=dict(size=10, color=THEME['text_dim'])))
-        
-        # 4. Duration Box
-        dur_df = df[df['duration'].notna()]
-        if not dur_df.empty:
-            duration = go.Figure()
-            for status in ['success', 'failed']:
-                subset = dur_df[dur_df['status'] == status]
-                if not subset.empty:
-                    duration.add_trace(go.Box(y=subset['duration'], name=status.title(), 
-                                             marker_color=colors_map.get(status), boxpoints=False))
-            duration.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=50,r=20,t=10,b=30),
-                                  showlegend=False, yaxis=dict(title=dict(text='Seconds', font=dict(size=11, color=THEME['text_dim'])), 
-                                                              gridcolor='#f1f5f9',
-                                                              tickfont=dict(size=10, color=THEME['text_dim'])))
-        else:
-            duration = empty_fig()
-        
-        # 5. Hourly Bar
-        hourly = df.groupby('hour').size().reindex(range(24), fill_value=0)
-        hourly_chart = go.Figure(go.Bar(x=list(range(24)), y=hourly.values, marker_color=THEME['accent']))
-        hourly_chart.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=40,r=20,t=10,b=30),
-                                  xaxis=dict(tickfont=dict(size=10, color=THEME['text_dim']), dtick=4),
-                                  yaxis=dict(showgrid=True, gridcolor='#f1f5f9', tickfont=dict(size=10, color=THEME['text_dim'])))
-        
-        # 6. Repo Bar
-        repo_counts = df['repo_url'].value_counts().head(5)
-        repo_names = [r.split('/')[-1][:15] if r else 'Unknown' for r in repo_counts.index]
-        repo_chart = go.Figure(go.Bar(y=repo_names, x=repo_counts.values, orientation='h', marker_color=THEME['accent']))
-        repo_chart.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=100,r=20,t=10,b=30),
-                                xaxis=dict(showgrid=True, gridcolor='#f1f5f9', tickfont=dict(size=10, color=THEME['text_dim'])),
-                                yaxis=dict(tickfont=dict(size=11, color=THEME['text'])))
-        
-        # 7. Trend Line
-        daily_stats = df.groupby('date').agg(success=('status', lambda x: (x=='success').sum()),
-                                              failed=('status', lambda x: (x=='failed').sum())).reset_index()
-        trend = go.Figure()
-        trend.add_trace(go.Scatter(x=daily_stats['date'], y=daily_stats['success'], name='Success', mode='lines+markers',
-                                   line=dict(color=THEME['success'], width=2), marker=dict(size=6)))
-        trend.add_trace(go.Scatter(x=daily_stats['date'], y=daily_stats['failed'], name='Failed', mode='lines+markers',
-                                   line=dict(color=THEME['error'], width=2), marker=dict(size=6)))
-        trend.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=40,r=20,t=10,b=40),
-                           legend=dict(orientation='h', y=1.1, font=dict(size=11, color=THEME['text_dim'])),
-                           xaxis=dict(showgrid=False, tickfont=dict(size=10, color=THEME['text_dim'])),
-                           yaxis=dict(showgrid=True, gridcolor='#f1f5f9', tickfont=dict(size=10, color=THEME['text_dim'])))
-        
-        # Jobs Table
-        table = create_table(df.head(8))
-        
-        # Logs Feed
-        if not logs.empty:
-            log_colors = {'info': THEME['info'], 'error': THEME['error'], 'warn': THEME['warning']}
-            logs_feed = [html.Div([
-                html.Span("●", style={'color': log_colors.get(row['level'], THEME['text_dim']), 'marginRight': '8px', 'fontSize': '8px'}),
-                html.Span(str(row['message'])[:50], style={'fontSize': '12px', 'color': THEME['text']})
-            ], style={'padding': '8px 0', 'borderBottom': f'1px solid {THEME["border"]}'}) for _, row in logs.head(20).iterrows()]
-        else:
-            logs_feed = [html.P("Waiting for logs...", style={'color': THEME['text_dim'], 'textAlign': 'center', 'padding': '40px'})]
-        
-        return kpis, throughput, status_pie, heatmap, duration, hourly_chart, repo_chart, trend, table, logs_feed
+        # Same user and unchanged jobs: reuse the last render (concurrent misses share one).
+        # Logs and step timings aren't versioned, so those panels refresh on DASHBOARD_CACHE_TTL
+        version = fetch_data_version(user_id)
+        return render_cache.get_or_compute((user_id, version), lambda: render_dashboard(user_id))
+
+
+def render_dashboard(user_id):
+    """Fetch data and build every KPI, figure and panel for one user (or all users)"""
+    # Independent queries, issued together so the render waits for the slowest, not their sum
+    rollups, active, recent, logs, stage_times, user_count = concurrent(
+        lambda: fetch_rollups(user_id),
+        lambda: fetch_active_counts(user_id),
+        lambda: fetch_jobs(user_id, limit=8),
+        lambda: fetch_logs(user_id),
+        lambda: fetch_stage_times(user_id),
+        fetch_user_count
+    )
+    
+    def empty_fig(h=200):
+        fig = go.Figure()
+        fig.add_annotation(text='No data available', x=0.5, y=0.5, xref='paper', yref='paper',
+                          showarrow=False, font=dict(size=14, color=THEME['text_dim']))
+        fig.update_layout(
+            paper_bgcolor='#fff', plot_bgcolor='#fff', height=h, 
+            margin=dict(l=20, r=20, t=20, b=20),
+            xaxis=dict(visible=False, showgrid=False),
+            yaxis=dict(visible=False, showgrid=False)
+        )
+        return fig
+    
+    if rollups.empty and recent.empty:
+        kpis = [kpi_card("Total Jobs", 0, THEME['accent']), kpi_card("Success Rate", "0%", THEME['success']),
+                kpi_card("Failed", 0, THEME['error']), kpi_card("Running", 0, THEME['info']),
+                kpi_card("Avg Duration", "0s", THEME['warning']), kpi_card("Users", user_count, THEME['accent2'])]
+        return kpis, empty_fig(220), empty_fig(220), empty_fig(200), empty_fig(200), empty_fig(200), empty_fig(200), empty_fig(200), \
+               empty_fig(200), \
+               html.P("No jobs yet - create a pipeline to see data here", style={'color': THEME['text_dim'], 'textAlign': 'center', 'padding': '40px'}), \
+               html.P("No logs yet", style={'color': THEME['text_dim'], 'textAlign': 'center', 'padding': '40px'})
+    
+    # Stats
+    status_totals = rollups.groupby('status', observed=True)['job_count'].sum().to_dict()
+    status_totals.update(active)
+    status_totals = pd.Series(status_totals, dtype='int64')
+    status_totals = status_totals[status_totals > 0]
+    total = int(status_totals.sum())
+    success = int(status_totals.get('success', 0))
+    failed = int(status_totals.get('failed', 0))
+    running = int(status_totals.get('running', 0))
+    rate = f"{success/total*100:.0f}%" if total else "0%"
+    duration_count = rollups['duration_count'].sum()
+    avg_dur = f"{rollups['duration_sum'].sum() / duration_count:.0f}s" if duration_count else "0s"
+    
+    kpis = [kpi_card("Total Jobs", total, THEME['accent']), kpi_card("Success Rate", rate, THEME['success']),
+            kpi_card("Failed", failed, THEME['error']), kpi_card("Running", running, THEME['info']),
+            kpi_card("Avg Duration", avg_dur, THEME['warning']), kpi_card("Users", user_count, THEME['accent2'])]
+    
+    # 1. Throughput Area
+    daily = rollups.groupby('date')['job_count'].sum().reset_index(name='count')
+    throughput = go.Figure()
+    throughput.add_trace(go.Scatter(x=daily['date'], y=daily['count'], mode='lines', fill='tozeroy',
+                                    line=dict(color=THEME['accent'], width=2), fillcolor='rgba(99,102,241,0.1)'))
+    throughput.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=220, margin=dict(l=40,r=20,t=10,b=40),
+                            xaxis=dict(showgrid=False, tickfont=dict(size=11, color=THEME['text_dim'])),
+                            yaxis=dict(showgrid=True, gridcolor='#f1f5f9', tickfont=dict(size=11, color=THEME['text_dim'])),
+                            uirevision='constant')
+    
+    # 2. Status Pie
+    status_counts = status_totals.sort_values(ascending=False)
+    colors_map = {'success': THEME['success'], 'failed': THEME['error'], 'running': THEME['info'], 
+                  'pending': THEME['text_dim'], 'cancelled': THEME['warning']}
+    status_pie = go.Figure(go.Pie(values=status_counts.values, labels=status_counts.index, hole=0.5,
+                                  marker=dict(colors=[colors_map.get(s, THEME['text_dim']) for s in status_counts.index]),
+                                  textinfo='percent', textfont=dict(size=12, color='#fff')))
+    status_pie.update_layout(paper_bgcolor='#fff', height=220, margin=dict(l=20,r=20,t=10,b=10),
+                            legend=dict(orientation='h', y=-0.1, font=dict(size=11, color=THEME['text_dim'])),
+                            uirevision='constant')
+    
+    # 3. Heatmap
+    heatmap_data = rollups.groupby(['day_name', 'hour'], observed=True)['job_count'].sum().unstack(fill_value=0)\
+        .reindex(index=DAYS_ORDER, columns=range(24), fill_value=0)
+    heatmap = go.Figure(go.Heatmap(z=heatmap_data.values, x=list(range(24)), y=['Mon','Tue','Wed','Thu','Fri','Sat','Sun'],
+                                   colorscale=[[0, '#f1f5f9'], [0.5, '#a5b4fc'], [1, THEME['accent']]], showscale=False))
+    heatmap.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=40,r=20,t=10,b=30),
+                         xaxis=dict(tickfont=dict(size=10, color=THEME['text_dim']), dtick=4),
+                         yaxis=dict(tickfont=dict(size=10, color=THEME['text_dim'])))
+    
+    # 4. Duration Box (quartiles estimated from the rollup histograms)
+    if duration_count:
+        duration = go.Figure()
+        for status in ['success', 'failed']:
+            hist = merge_histograms(rollups[rollups['status'] == status]['duration_hist'])
+            if sum(hist):
+                q = [histogram_quantile(hist, p) for p in (0.05, 0.25, 0.5, 0.75, 0.95)]
+                duration.add_trace(go.Box(x=[status.title()], lowerfence=[q[0]], q1=[q[1]], median=[q[2]],
+                                         q3=[q[3]], upperfence=[q[4]], name=status.title(),
+                                         marker_color=colors_map.get(status), boxpoints=False))
+        duration.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=50,r=20,t=10,b=30),
+                              showlegend=False, yaxis=dict(title=dict(text='Seconds', font=dict(size=11, color=THEME['text_dim'])), 
+                                                          gridcolor='#f1f5f9',
+                                                          tickfont=dict(size=10, color=THEME['text_dim'])))
+    else:
+        duration = empty_fig()
+    
+    # 5. Hourly Bar
+    hourly = rollups.groupby('hour')['job_count'].sum().reindex(range(24), fill_value=0)
+    hourly_chart = go.Figure(go.Bar(x=list(range(24)), y=hourly.values, marker_color=THEME['accent']))
+    hourly_chart.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=40,r=20,t=10,b=30),
+                              xaxis=dict(tickfont=dict(size=10, color=THEME['text_dim']), dtick=4),
+                              yaxis=dict(showgrid=True, gridcolor='#f1f5f9', tickfont=dict(size=10, color=THEME['text_dim'])))
+    
+    # 6. Repo Bar
+    repo_counts = rollups.groupby('repo_url', observed=True)['job_count'].sum().sort_values(ascending=False).head(5)
+    repo_names = [r.split('/')[-1][:15] if r else 'Unknown' for r in repo_counts.index]
+    repo_chart = go.Figure(go.Bar(y=repo_names, x=repo_counts.values, orientation='h', marker_color=THEME['accent']))
+    repo_chart.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=100,r=20,t=10,b=30),
+                            xaxis=dict(showgrid=True, gridcolor='#f1f5f9', tickfont=dict(size=10, color=THEME['text_dim'])),
+                            yaxis=dict(tickfont=dict(size=11, color=THEME['text'])))
+    
+    # 7. Trend Line
+    daily_stats = rollups.pivot_table(index='date', columns='status', values='job_count', aggfunc='sum',
+                                      fill_value=0, observed=True)\
+        .reindex(columns=['success', 'failed'], fill_value=0).reset_index()
+    trend = go.Figure()
+    trend.add_trace(go.Scatter(x=daily_stats['date'], y=daily_stats['success'], name='Success', mode='lines+markers',
+                               line=dict(color=THEME['success'], width=2), marker=dict(size=6)))
+    trend.add_trace(go.Scatter(x=daily_stats['date'], y=daily_stats['failed'], name='Failed', mode='lines+markers',
+                               line=dict(color=THEME['error'], width=2), marker=dict(size=6)))
+    trend.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=40,r=20,t=10,b=40),
+                       legend=dict(orientation='h', y=1.1, font=dict(size=11, color=THEME['text_dim'])),
+                       xaxis=dict(showgrid=False, tickfont=dict(size=10, color=THEME['text_dim'])),
+                       yaxis=dict(showgrid=True, gridcolor='#f1f5f9', tickfont=dict(size=10, color=THEME['text_dim'])))
+    
+    # 8. Stage Breakdown (average seconds per job, busiest repos)
+    if not stage_times.empty:
+        jobs_per_repo = stage_times.groupby('repo_url')['job_id'].nunique().sort_values(ascending=False).head(5)
+        per_stage = stage_times[stage_times['repo_url'].isin(jobs_per_repo.index)]\
+            .pivot_table(index='repo_url', columns='kind', values='duration_ms', aggfunc='sum', fill_value=0, observed=False)\
+            .div(jobs_per_repo, axis=0) / 1000
+        stage_colors = dict(zip(STAGE_KINDS, [THEME['text_dim'], THEME['info'], THEME['accent2'],
+                                              THEME['warning'], THEME['accent'], THEME['border']]))
+        stage_chart = go.Figure([
+            go.Bar(y=[r.split('/')[-1][:15] if r else 'Unknown' for r in per_stage.index], x=per_stage[kind],
+                   name=kind, orientation='h', marker_color=stage_colors[kind])
+            for kind in STAGE_KINDS if kind in per_stage and per_stage[kind].any()
+        ])
+        stage_chart.update_layout(paper_bgcolor='#fff', plot_bgcolor='#fff', height=200, margin=dict(l=100,r=20,t=10,b=30),
+                                  barmode='stack', legend=dict(orientation='h', y=1.15, font=dict(size=10, color=THEME['text_dim'])),
+                                  xaxis=dict(title=dict(text='Seconds per job', font=dict(size=11, color=THEME['text_dim'])),
+                                             showgrid=True, gridcolor='#f1f5f9', tickfont=dict(size=10, color=THEME['text_dim'])),
+                                  yaxis=dict(tickfont=dict(size=11, color=THEME['text'])))
+    else:
+        stage_chart = empty_fig()
+    
+    # Jobs Table
+    table = create_table(recent)
+    
+    # Logs Feed
+    if not logs.empty:
+        log_colors = {'info': THEME['info'], 'error': THEME['error'], 'warn': THEME['warning']}
+        logs_feed = [html.Div([
+            html.Span("●", style={'color': log_colors.get(row['level'], THEME['text_dim']), 'marginRight': '8px', 'fontSize': '8px'}),
+            html.Span(str(row['message'])[:50], style={'fontSize': '12px', 'color': THEME['text']})
+        ], style={'padding': '8px 0', 'borderBottom': f'1px solid {THEME["border"]}'}) for _, row in logs.head(20).iterrows()]
+    else:
+        logs_feed = [html.P("Waiting for logs...", style={'color': THEME['text_dim'], 'textAlign': 'center', 'padding': '40px'})]
+    
+    return kpis, throughput, status_pie, heatmap, duration, hourly_chart, repo_chart, trend, stage_chart, table, logs_feed
 
 
 def kpi_card(label, value, color):
@@ -0,0 +1,25 @@
+import os
+import shutil
+
+# Worker processes share metrics through files in PROMETHEUS_MULTIPROC_DIR
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+# One process by default: the in-process runner's HOST_CPUS/HOST_MEMORY_MB budget is per process,
+# so more workers would overbook the machine unless MAX_CONCURRENT_JOBS=0
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+worker_class = 'gthread'
+# Log streams and runner long-polls each hold a thread; LOG_STREAM_MAX_CONCURRENT and
+# RUNNER_MAX_LONG_POLLS keep some free for other requests
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+
+def on_starting(server):
+    """Start every deploy with empty metric files"""
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges (running jobs) from the totals"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
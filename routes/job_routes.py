@@ -1,10 +1,27 @@
-from flask import Blueprint, request, jsonify, g
+import json
+import uuid
+import base64
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 from auth import jwt_required
-from config import supabase
+from config import (
+    supabase, LOG_PAGE_DEFAULT, LOG_PAGE_MAX, JOBS_PAGE_DEFAULT, JOBS_PAGE_MAX,
+    HOST_CPUS, HOST_MEMORY_MB, JOB_DEFAULT_CPUS, JOB_DEFAULT_MEMORY_MB,
+    MAX_CONCURRENT_JOBS, RUNNER_LABELS, RUNNER_OFFLINE_AFTER, LOG_STREAM_RETRY_AFTER
+)
 from services.job_runner import start_job, cancel_job
+from services.log_stream import log_events, acquire_slot, release_slot
+from services.log_store import fetch_logs
+from services.job_queue import parse_labels
+from storage import concurrent
 
 jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
 
+# Columns clients may ask for with ?fields=
+JOB_FIELDS = ['id', 'user_id', 'repo_url', 'branch', 'status', 'created_at', 'started_at', 'finished_at',
+              'attempts', 'logs_archived_at', 'trigger', 'commit_sha', 'force', 'cached_from',
+              'cpus', 'memory_mb', 'labels', 'runner_id']
+
 @jobs_bp.route('', methods=['POST'])
 @jwt_required
 def create_job():
@@ -28,6 +45,15 @@ def create_job():
     if '/blob/' in repo_url:
         repo_url = repo_url.split('/blob/')[0]
     
+    # Only runners with every one of these labels will pick the job up
+    labels, error = parse_labels(data.get('labels'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    budget, error = _resource_request(data, labels)
+    if error:
+        return jsonify({'error': error}), 400
+    
     # Ensure .git suffix works
     if not repo_url.endswith('.git') and 'github.com' in repo_url:
         repo_url = repo_url.rstrip('/')
@@ -37,7 +63,10 @@ def create_job():
         'user_id': g.user_id,
         'repo_url': repo_url,
         'branch': branch,
-        'status': 'pending'
+        'status': 'pending',
+        'force': bool(data.get('force')),
+        'labels': labels,
+        **budget
     }).execute()
     
     if not result.data:
@@ -45,22 +74,58 @@ def create_job():
     
     job = result.data[0]
     
-    # Start job execution
-    start_job(job['id'], repo_url, branch)
+    # Wake a runner; the pending row is the queue entry
+    start_job(job['id'])
     
     return jsonify(job), 201
 
 @jobs_bp.route('', methods=['GET'])
 @jwt_required
 def list_jobs():
-    """List all jobs for current user"""
-    result = supabase.table('jobs')\
-        .select('*')\
-        .eq('user_id', g.user_id)\
+    """List jobs for current user, newest first (?limit, ?cursor, ?status, ?repo_url, ?branch, ?fields)"""
+    fields = request.args.get('fields')
+    if fields:
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in JOB_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        # The cursor is built from these, so always fetch them
+        fields = list(dict.fromkeys(fields + ['id', 'created_at']))
+    
+    limit = min(max(request.args.get('limit', JOBS_PAGE_DEFAULT, type=int), 1), JOBS_PAGE_MAX)
+    
+    query = supabase.table('jobs')\
+        .select(', '.join(fields) if fields else '*')\
+        .eq('user_id', g.user_id)
+    
+    statuses = request.args.get('status')
+    if statuses:
+        query = query.in_('status', statuses.split(','))
+    for column in ['repo_url', 'branch']:
+        if request.args.get(column):
+            query = query.eq(column, request.args[column])
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, job_id = _decode_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        # Keyset: strictly older than the last job of the previous page
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{job_id})')
+    
+    result = query\
         .order('created_at', desc=True)\
+        .order('id', desc=True)\
+        .limit(limit)\
         .execute()
     
-    return jsonify(result.data), 200
+    jobs = result.data or []
+    response = jsonify(jobs)
+    if len(jobs) == limit:
+        # Pass back as ?cursor= to get the next page
+        response.headers['X-Next-Cursor'] = _encode_cursor(jobs[-1])
+    return _conditional(response)
 
 @jobs_bp.route('/<job_id>', methods=['GET'])
 @jwt_required
@@ -75,7 +140,7 @@ def get_job(job_id):
     if not result.data:
         return jsonify({'error': 'Job not found'}), 404
     
-    return jsonify(result.data[0]), 200
+    return _conditional(jsonify(result.data[0]))
 
 @jobs_bp.route('/<job_id>', methods=['DELETE'])
 @jwt_required
@@ -99,7 +164,7 @@ def delete_job(job_id):
 @jobs_bp.route('/<job_id>/cancel', methods=['POST'])
 @jwt_required
 def cancel_job_route(job_id):
-    """Cancel a running job"""
+    """Cancel a pending or running job"""
     # Check ownership
     check = supabase.table('jobs')\
         .select('id, status')\
@@ -110,7 +175,7 @@ def cancel_job_route(job_id):
     if not check.data:
         return jsonify({'error': 'Job not found'}), 404
     
-    if check.data[0]['status'] != 'running':
+    if check.data[0]['status'] not in ['pending', 'running']:
         return jsonify({'error': 'Job is not running'}), 400
     
     cancelled = cancel_job(job_id)
@@ -123,10 +188,10 @@ def cancel_job_route(job_id):
 @jobs_bp.route('/<job_id>/logs', methods=['GET'])
 @jwt_required
 def get_job_logs(job_id):
-    """Get logs for a job"""
+    """Get logs for a job (?after=<seq>&limit=N, or ?tail=N)"""
     # Check ownership
     check = supabase.table('jobs')\
-        .select('id')\
+        .select('id, logs_archived_at')\
         .eq('id', job_id)\
         .eq('user_id', g.user_id)\
         .execute()
@@ -134,13 +199,85 @@ def get_job_logs(job_id):
     if not check.data:
         return jsonify({'error': 'Job not found'}), 404
     
-    result = supabase.table('job_logs')\
-        .select('*')\
-        .eq('job_id', job_id)\
-        .order('created_at', desc=False)\
+    after = request.args.get('after', type=int)
+    limit = min(max(request.args.get('limit', LOG_PAGE_DEFAULT, type=int), 1), LOG_PAGE_MAX)
+    tail = request.args.get('tail', type=int)
+    
+    logs = fetch_logs(
+        job_id,
+        after=after,
+        limit=limit,
+        tail=min(max(tail, 1), LOG_PAGE_MAX) if tail is not None else None,
+        archived=bool(check.data[0]['logs_archived_at'])
+    )
+    
+    response = jsonify(logs)
+    if logs:
+        # Pass back as ?after= to get the next page
+        response.headers['X-Next-Cursor'] = str(logs[-1]['seq'])
+    return _conditional(response)
+
+@jobs_bp.route('/<job_id>/logs/stream', methods=['GET'])
+@jwt_required
+def stream_job_logs(job_id):
+    """Stream logs for a job as server-sent events"""
+    # Check ownership
+    check = supabase.table('jobs')\
+        .select('id')\
+        .eq('id', job_id)\
+        .eq('user_id', g.user_id)\
         .execute()
     
-    return jsonify(result.data), 200
+    if not check.data:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    # Resume after the last line the client saw
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('after')
+    cursor = int(cursor) if cursor and cursor.isdigit() else None
+    
+    # Too many open streams would leave no threads for other requests
+    if not acquire_slot():
+        response = jsonify({'error': 'Too many log streams open; retry shortly or poll /logs'})
+        response.headers['Retry-After'] = str(LOG_STREAM_RETRY_AFTER)
+        return response, 503
+    
+    response = Response(
+        stream_with_context(log_events(job_id, cursor)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, even if the client left before the first event
+    response.call_on_close(release_slot)
+    return response
+
+@jobs_bp.route('/<job_id>/timings', methods=['GET'])
+@jwt_required
+def get_job_timings(job_id):
+    """Get how long each stage of a job took"""
+    # Ownership check and the read don't depend on each other; the steps are dropped if it fails
+    user_id = g.user_id
+    check, result = concurrent(
+        lambda: supabase.table('jobs')
+            .select('id')
+            .eq('id', job_id)
+            .eq('user_id', user_id)
+            .execute(),
+        lambda: supabase.table('job_steps')
+            .select('kind, name, step, started_at, duration_ms, status, exit_code')
+            .eq('job_id', job_id)
+            .order('started_at', desc=False)
+            .execute()
+    )
+    
+    if not check.data:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    steps = result.data or []
+    totals = {}
+    for row in steps:
+        totals[row['kind']] = totals.get(row['kind'], 0) + row['duration_ms']
+    
+    return _conditional(jsonify({'job_id': job_id, 'totals_ms': totals, 'steps': steps}))
 
 @jobs_bp.route('/<job_id>/retry', methods=['POST'])
 @jwt_required
@@ -166,13 +303,72 @@ def retry_job(job_id):
         'user_id': g.user_id,
         'repo_url': original['repo_url'],
         'branch': original['branch'],
-        'status': 'pending'
+        'status': 'pending',
+        'trigger': 'retry',
+        'force': bool((request.get_json(silent=True) or {}).get('force')),
+        'cpus': original.get('cpus', JOB_DEFAULT_CPUS),
+        'memory_mb': original.get('memory_mb', JOB_DEFAULT_MEMORY_MB),
+        'labels': original.get('labels') or []
     }).execute()
     
     if not new_job.data:
         return jsonify({'error': 'Failed to create retry job'}), 500
     
     job = new_job.data[0]
-    start_job(job['id'], original['repo_url'], original['branch'])
+    start_job(job['id'])
     
     return jsonify(job), 201
+
+def _resource_request(data, labels):
+    """CPU and memory a new job asks for; returns (fields, error)"""
+    try:
+        cpus = float(data.get('cpus', JOB_DEFAULT_CPUS))
+        memory_mb = int(data.get('memory_mb', JOB_DEFAULT_MEMORY_MB))
+    except (TypeError, ValueError):
+        return None, 'cpus and memory_mb must be numbers'
+    
+    if cpus <= 0 or memory_mb <= 0:
+        return None, 'cpus and memory_mb must be positive'
+    
+    # A job bigger than every runner that could take it would wait in the queue forever.
+    # With no such runner online yet, the job waits for one to register.
+    runners = _runner_capacities(labels)
+    if runners and not any((not max_cpus or cpus <= max_cpus) and (not max_memory or memory_mb <= max_memory)
+                           for max_cpus, max_memory in runners):
+        return None, f'No runner with these labels has {cpus:g} CPUs and {memory_mb} MB'
+    return {'cpus': cpus, 'memory_mb': memory_mb}, None
+
+def _runner_capacities(labels):
+    """(cpus, memory_mb) of each runner able to take a job with these labels"""
+    runners = []
+    if MAX_CONCURRENT_JOBS > 0 and (RUNNER_LABELS is None or set(labels) <= set(RUNNER_LABELS)):
+        runners.append((HOST_CPUS, HOST_MEMORY_MB))
+    
+    online = datetime.now(timezone.utc) - timedelta(seconds=RUNNER_OFFLINE_AFTER)
+    result = supabase.table('runners')\
+        .select('labels, cpus, memory_mb')\
+        .gte('last_seen_at', online.isoformat())\
+        .execute()
+    runners.extend((row['cpus'], row['memory_mb']) for row in result.data or []
+                   if set(labels) <= set(row['labels'] or []))
+    return runners
+
+def _conditional(response):
+    """Tag a 200 response with an ETag and answer a matching If-None-Match with 304"""
+    response.add_etag()
+    # Cacheable, but only by this client and only after revalidating
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+def _encode_cursor(job):
+    raw = json.dumps([job['created_at'], job['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    try:
+        created_at, job_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        # Both end up inside a filter expression, so only accept well-formed values
+        datetime.fromisoformat(created_at)
+        return created_at, str(uuid.UUID(job_id))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
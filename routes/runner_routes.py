@@ -0,0 +1,291 @@
+import hmac
+import math
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+from functools import wraps
+from flask import Blueprint, request, jsonify, g
+from config import supabase, RUNNER_TOKEN, RUNNER_LONG_POLL_SECONDS, RUNNER_MAX_LONG_POLLS, JOB_POLL_INTERVAL
+from services import job_queue, build_cache, log_sink
+from services.job_runner import complete_remote_job
+
+runners_bp = Blueprint('runners', __name__, url_prefix='/api/runners')
+
+LOG_LEVELS = ['info', 'warn', 'error']
+
+# Each waiting long-poll holds a gunicorn thread, so only this many wait at once
+_long_polls = threading.BoundedSemaphore(RUNNER_MAX_LONG_POLLS)
+
+def runner_required(f):
+    """Require the shared RUNNER_TOKEN, and load the runner named in the path"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not RUNNER_TOKEN:
+            return jsonify({'error': 'Runner agents are not enabled on this server'}), 404
+
+        auth_header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth_header, f'Bearer {RUNNER_TOKEN}'):
+            return jsonify({'error': 'Invalid runner token'}), 401
+
+        if 'runner_id' in kwargs:
+            result = supabase.table('runners').select('*').eq('id', kwargs['runner_id']).execute()
+            if not result.data:
+                return jsonify({'error': 'Runner not found; register again'}), 404
+            g.runner = result.data[0]
+            g.lease_owner = f"runner:{g.runner['id']}"
+        return f(*args, **kwargs)
+
+    return decorated
+
+@runners_bp.route('', methods=['POST'])
+@runner_required
+def register_runner():
+    """Register a runner agent and the labels it offers"""
+    data = request.get_json(silent=True) or {}
+
+    labels, error = job_queue.parse_labels(data.get('labels'))
+    cpus, cpus_error = _number(data, 'cpus')
+    memory_mb, memory_error = _number(data, 'memory_mb', int)
+    error = error or cpus_error or memory_error
+    if error:
+        return jsonify({'error': error}), 400
+
+    result = supabase.table('runners').insert({
+        'name': str(data.get('name') or 'runner')[:100],
+        'labels': labels,
+        'cpus': cpus,
+        'memory_mb': memory_mb
+    }).execute()
+
+    if not result.data:
+        return jsonify({'error': 'Failed to register runner'}), 500
+
+    return jsonify(result.data[0]), 201
+
+@runners_bp.route('/<runner_id>/lease', methods=['POST'])
+@runner_required
+def lease_job(runner_id):
+    """Long-poll for a job matching the runner's labels and free capacity (204 when none came)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        wait = min(max(float(data.get('wait', RUNNER_LONG_POLL_SECONDS)), 0), RUNNER_LONG_POLL_SECONDS)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    max_cpus, cpus_error = _number(data, 'max_cpus')
+    max_memory_mb, memory_error = _number(data, 'max_memory_mb', int)
+    if cpus_error or memory_error:
+        return jsonify({'error': cpus_error or memory_error}), 400
+    _touch()
+
+    # Over the cap the request checks the queue once and tells the agent when to poll again
+    waiting = wait > 0 and _long_polls.acquire(blocking=False)
+    try:
+        response, status = _lease(runner_id, max_cpus, max_memory_mb, wait if waiting else 0)
+    finally:
+        if waiting:
+            _long_polls.release()
+    if status == 204 and wait > 0 and not waiting:
+        return response, status, {'Retry-After': str(math.ceil(JOB_POLL_INTERVAL))}
+    return response, status
+
+def _lease(runner_id, max_cpus, max_memory_mb, wait):
+    deadline = time.monotonic() + wait
+    while True:
+        job = job_queue.claim_job(
+            max_cpus=max_cpus,
+            max_memory_mb=max_memory_mb,
+            labels=g.runner['labels'] or [],
+            worker=g.lease_owner,
+            total_cpus=g.runner['cpus'],
+            total_memory_mb=g.runner['memory_mb']
+        )
+        if job:
+            supabase.table('jobs').update({'runner_id': runner_id}).eq('id', job['id']).execute()
+            return jsonify({**job, 'runner_id': runner_id}), 200
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return '', 204
+        # Woken at once for jobs queued by this process; others are found by re-polling
+        job_queue.wait_for_queued(min(remaining, JOB_POLL_INTERVAL))
+
+@runners_bp.route('/<runner_id>/heartbeat', methods=['POST'])
+@runner_required
+def heartbeat(runner_id):
+    """Renew the runner's leases; jobs missing from the reply were cancelled or re-leased"""
+    _touch()
+    owned = job_queue.renew_leases(worker=g.lease_owner)
+    return jsonify({'job_ids': sorted(owned)}), 200
+
+@runners_bp.route('/<runner_id>/jobs/<job_id>/logs', methods=['POST'])
+@runner_required
+def append_logs(runner_id, job_id):
+    """Append a batch of log lines for a job the runner holds"""
+    if not _held(job_id):
+        return jsonify({'error': 'Runner does not hold this job'}), 409
+
+    lines = (request.get_json(silent=True) or {}).get('lines')
+    if not isinstance(lines, list):
+        return jsonify({'error': 'lines must be a list'}), 400
+
+    rows = []
+    for line in lines:
+        if not isinstance(line, dict):
+            return jsonify({'error': 'each line must be an object'}), 400
+        created_at, error = _timestamp(line, 'created_at')
+        step, step_error = _text(line, 'step')
+        if error or step_error:
+            return jsonify({'error': error or step_error}), 400
+        rows.append({
+            'job_id': job_id,
+            'message': str(line.get('message', '')),
+            'level': line.get('level') if line.get('level') in LOG_LEVELS else 'info',
+            'step': step,
+            'created_at': created_at or datetime.now(timezone.utc).isoformat()
+        })
+    if rows:
+        log_sink.append(job_id, rows)
+
+    return jsonify({'written': len(rows)}), 200
+
+@runners_bp.route('/<runner_id>/jobs/<job_id>/status', methods=['POST'])
+@runner_required
+def report_status(runner_id, job_id):
+    """Record a job's final status; 409 if the runner lost the lease first"""
+    data = request.get_json(silent=True) or {}
+    status = data.get('status')
+    if status not in ['success', 'failed']:
+        return jsonify({'error': 'status must be success or failed'}), 400
+
+    fields = {}
+    if data.get('cached_from') and status == 'success':
+        try:
+            fields['cached_from'] = str(uuid.UUID(str(data['cached_from'])))
+        except ValueError:
+            return jsonify({'error': 'cached_from must be a job id'}), 400
+
+    if not complete_remote_job(job_id, status, g.lease_owner, **fields):
+        return jsonify({'error': 'Runner does not hold this job'}), 409
+
+    return jsonify({'status': status}), 200
+
+@runners_bp.route('/<runner_id>/jobs/<job_id>/steps', methods=['POST'])
+@runner_required
+def save_steps(runner_id, job_id):
+    """Store the timed stages of a job the runner ran (sent after it finishes)"""
+    job = _job(job_id)
+    if not job or job.get('runner_id') != runner_id:
+        return jsonify({'error': 'Runner did not run this job'}), 409
+
+    steps = (request.get_json(silent=True) or {}).get('steps')
+    if not isinstance(steps, list):
+        return jsonify({'error': 'steps must be a list'}), 400
+
+    rows = []
+    for step in steps:
+        row, error = _step_row(step)
+        if error:
+            return jsonify({'error': error}), 400
+        rows.append({**row, 'job_id': job_id, 'repo_url': job['repo_url']})
+    if rows:
+        supabase.table('job_steps').insert(rows).execute()
+
+    return jsonify({'written': len(rows)}), 200
+
+@runners_bp.route('/<runner_id>/jobs/<job_id>/build-cache', methods=['GET'])
+@runner_required
+def lookup_build(runner_id, job_id):
+    """Find an earlier successful build of the job's repository at this commit and config"""
+    job = _held(job_id)
+    if not job:
+        return jsonify({'error': 'Runner does not hold this job'}), 409
+
+    cached_from = build_cache.lookup(job['repo_url'], request.args.get('commit_sha', ''),
+                                     request.args.get('config_hash', ''))
+    return jsonify({'job_id': cached_from}), 200
+
+@runners_bp.route('/<runner_id>/jobs/<job_id>/build-cache', methods=['POST'])
+@runner_required
+def record_build(runner_id, job_id):
+    """Remember a successful build the runner just finished"""
+    job = _job(job_id)
+    if not job or job.get('runner_id') != runner_id or job['status'] != 'success':
+        return jsonify({'error': 'Not a successful job of this runner'}), 409
+
+    data = request.get_json(silent=True) or {}
+    if not data.get('commit_sha') or not data.get('config_hash'):
+        return jsonify({'error': 'commit_sha and config_hash are required'}), 400
+
+    build_cache.record(job['repo_url'], data['commit_sha'], data['config_hash'], job_id)
+    return jsonify({'job_id': job_id}), 200
+
+def _step_row(step):
+    """A job_steps row from what the runner sent; returns (row, error)"""
+    if not isinstance(step, dict):
+        return None, 'each step must be an object'
+    row = {}
+    checks = [
+        ('kind', lambda: _text(step, 'kind', required=True)),
+        ('name', lambda: _text(step, 'name')),
+        ('step', lambda: _text(step, 'step')),
+        ('status', lambda: _text(step, 'status')),
+        ('started_at', lambda: _timestamp(step, 'started_at', required=True)),
+        ('duration_ms', lambda: _number(step, 'duration_ms', int, required=True)),
+        ('exit_code', lambda: _number(step, 'exit_code', int, minimum=None))
+    ]
+    for field, check in checks:
+        row[field], error = check()
+        if error:
+            return None, error
+    return row, None
+
+def _number(data, key, kind=float, required=False, minimum=0):
+    """data[key] as a finite number (None if absent); returns (value, error)"""
+    value = data.get(key)
+    if value is None:
+        return None, f'{key} is required' if required else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None, f'{key} must be a number'
+    if minimum is not None and value < minimum:
+        return None, f'{key} must be at least {minimum}'
+    return kind(value), None
+
+def _timestamp(data, key, required=False):
+    """data[key] as an ISO 8601 timestamp (None if absent); returns (value, error)"""
+    value = data.get(key)
+    if value is None:
+        return None, f'{key} is required' if required else None
+    try:
+        datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None, f'{key} must be an ISO 8601 timestamp'
+    return value, None
+
+def _text(data, key, required=False):
+    value = data.get(key)
+    if value is None:
+        return None, f'{key} is required' if required else None
+    if not isinstance(value, str):
+        return None, f'{key} must be a string'
+    return value, None
+
+def _job(job_id):
+    result = supabase.table('jobs')\
+        .select('id, repo_url, status, lease_owner, runner_id')\
+        .eq('id', job_id)\
+        .execute()
+    return result.data[0] if result.data else None
+
+def _held(job_id):
+    """The job, if this runner currently holds its lease"""
+    job = _job(job_id)
+    if job and job['status'] == 'running' and job['lease_owner'] == g.lease_owner:
+        return job
+    return None
+
+def _touch():
+    supabase.table('runners')\
+        .update({'last_seen_at': datetime.now(timezone.utc).isoformat()})\
+        .eq('id', g.runner['id'])\
+        .execute()
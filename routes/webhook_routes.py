@@ -0,0 +1,161 @@
+import hmac
+import uuid
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, request, jsonify, g
+from auth import jwt_required
+from config import supabase, WEBHOOK_DEBOUNCE_SECONDS
+from services.job_runner import start_job, cancel_job
+
+webhooks_bp = Blueprint('webhooks', __name__, url_prefix='/api/webhooks')
+
+@webhooks_bp.route('', methods=['POST'])
+@jwt_required
+def create_webhook():
+    """Create a push webhook for a repository"""
+    data = request.get_json()
+
+    if not data or not data.get('repo_url'):
+        return jsonify({'error': 'repo_url is required'}), 400
+
+    result = supabase.table('webhooks').insert({
+        'user_id': g.user_id,
+        'repo_url': data['repo_url'].strip(),
+        'secret': secrets.token_hex(32)
+    }).execute()
+
+    if not result.data:
+        return jsonify({'error': 'Failed to create webhook'}), 500
+
+    hook = result.data[0]
+    # The secret is only ever shown here; paste it into the repository's webhook settings
+    return jsonify({**hook, 'url': f"{request.host_url.rstrip('/')}/api/webhooks/{hook['id']}"}), 201
+
+@webhooks_bp.route('', methods=['GET'])
+@jwt_required
+def list_webhooks():
+    """List webhooks for current user"""
+    result = supabase.table('webhooks')\
+        .select('id, repo_url, created_at')\
+        .eq('user_id', g.user_id)\
+        .order('created_at', desc=True)\
+        .execute()
+
+    return jsonify(result.data), 200
+
+@webhooks_bp.route('/<hook_id>', methods=['DELETE'])
+@jwt_required
+def delete_webhook(hook_id):
+    """Delete a webhook"""
+    if not _valid_id(hook_id):
+        return jsonify({'error': 'Webhook not found'}), 404
+
+    result = supabase.table('webhooks')\
+        .delete()\
+        .eq('id', hook_id)\
+        .eq('user_id', g.user_id)\
+        .execute()
+
+    if not result.data:
+        return jsonify({'error': 'Webhook not found'}), 404
+
+    return jsonify({'message': 'Webhook deleted'}), 200
+
+@webhooks_bp.route('/<hook_id>', methods=['POST'])
+def receive_webhook(hook_id):
+    """Receive a GitHub-style push event"""
+    if not _valid_id(hook_id):
+        return jsonify({'error': 'Webhook not found'}), 404
+
+    result = supabase.table('webhooks')\
+        .select('id, user_id, repo_url, secret')\
+        .eq('id', hook_id)\
+        .execute()
+
+    if not result.data:
+        return jsonify({'error': 'Webhook not found'}), 404
+
+    hook = result.data[0]
+
+    # Verify the signature over the raw body before trusting anything in it
+    expected = 'sha256=' + hmac.new(hook['secret'].encode('utf-8'), request.get_data(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, request.headers.get('X-Hub-Signature-256', '')):
+        return jsonify({'error': 'Invalid signature'}), 401
+
+    event = request.headers.get('X-GitHub-Event', 'push')
+    if event == 'ping':
+        return jsonify({'message': 'pong'}), 200
+    if event != 'push':
+        return jsonify({'message': f'Ignored {event} event'}), 202
+
+    payload = request.get_json(silent=True) or {}
+    ref = payload.get('ref', '')
+    sha = payload.get('after', '')
+    if not ref.startswith('refs/heads/') or payload.get('deleted') or not sha.strip('0'):
+        return jsonify({'message': 'Ignored: not a branch push'}), 202
+
+    job, coalesced = _enqueue_push(hook, ref[len('refs/heads/'):], sha)
+    if not job:
+        return jsonify({'error': 'Failed to create job'}), 500
+
+    return jsonify({'job': job, 'coalesced': coalesced}), 202
+
+def _enqueue_push(hook, branch, sha):
+    """Queue a build of the newest commit on a branch.
+
+    A push job still waiting out its debounce window just takes the new sha.
+    Otherwise a new job is queued and older pending or running push jobs for
+    the branch are cancelled (manual and retry runs are left alone).
+    Returns (job, coalesced).
+    """
+    now = datetime.now(timezone.utc)
+
+    waiting = supabase.table('jobs')\
+        .update({'commit_sha': sha})\
+        .eq('user_id', hook['user_id'])\
+        .eq('repo_url', hook['repo_url'])\
+        .eq('branch', branch)\
+        .eq('trigger', 'push')\
+        .eq('status', 'pending')\
+        .gt('not_before', now.isoformat())\
+        .execute()
+    if waiting.data:
+        return waiting.data[0], True
+
+    result = supabase.table('jobs').insert({
+        'user_id': hook['user_id'],
+        'repo_url': hook['repo_url'],
+        'branch': branch,
+        'status': 'pending',
+        'trigger': 'push',
+        'commit_sha': sha,
+        'not_before': (now + timedelta(seconds=WEBHOOK_DEBOUNCE_SECONDS)).isoformat()
+    }).execute()
+    if not result.data:
+        return None, False
+    job = result.data[0]
+
+    # Only jobs created before this one, so concurrent deliveries never cancel each other
+    superseded = supabase.table('jobs')\
+        .select('id')\
+        .eq('user_id', hook['user_id'])\
+        .eq('repo_url', hook['repo_url'])\
+        .eq('branch', branch)\
+        .eq('trigger', 'push')\
+        .in_('status', ['pending', 'running'])\
+        .lt('created_at', job['created_at'])\
+        .execute()
+    for old in superseded.data or []:
+        cancel_job(old['id'], f"Superseded by push of {sha[:7]}")
+
+    start_job(job['id'])
+    return job, False
+
+def _valid_id(hook_id):
+    """Whether hook_id is a uuid (Postgres rejects anything else with an error, not a miss)"""
+    try:
+        uuid.UUID(hook_id)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,42 @@
+"""
+Runner agent: leases jobs from a CI server over HTTP and runs them on this machine.
+
+    CI_SERVER_URL=https://ci.example.com RUNNER_TOKEN=... RUNNER_LABELS=python,large python runner_agent.py
+
+Start as many as you need; each takes jobs whose labels it has, up to
+MAX_CONCURRENT_JOBS / HOST_CPUS / HOST_MEMORY_MB at a time.
+"""
+import os
+import time
+import socket
+
+# Agents never touch the database; everything goes through the server's API
+os.environ['STORAGE_BACKEND'] = 'none'
+
+from config import CI_SERVER_URL, RUNNER_TOKEN, RUNNER_NAME, RUNNER_LABELS, HOST_CPUS, HOST_MEMORY_MB, MAX_CONCURRENT_JOBS
+from services import job_store
+from services.runner_client import RunnerClient
+from services.job_runner import scheduler
+from services.workspace_gc import start_workspace_gc
+
+def main():
+    if not RUNNER_TOKEN:
+        raise SystemExit('RUNNER_TOKEN is required (the same value the server has)')
+
+    client = RunnerClient(CI_SERVER_URL, RUNNER_TOKEN)
+    runner = client.register(RUNNER_NAME or socket.gethostname(), RUNNER_LABELS or [], HOST_CPUS, HOST_MEMORY_MB)
+    job_store.use_remote(client)
+    print(f"Registered runner {runner['name']} ({runner['id']}) with {CI_SERVER_URL}; "
+          f"labels: {', '.join(runner['labels']) or 'none'}; "
+          f"{MAX_CONCURRENT_JOBS} slots, {HOST_CPUS:g} CPUs, {HOST_MEMORY_MB} MB")
+
+    scheduler.start()
+    start_workspace_gc()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -34,3 +34,382 @@ create index if not exists idx_jobs_user_id on jobs(user_id);
 create index if not exists idx_jobs_status on jobs(status);
 create index if not exists idx_job_logs_job_id on job_logs(job_id);
 create index if not exists idx_users_email on users(email);
+
+-- Durable job queue: runners lease pending jobs and renew the lease while running
+alter table jobs add column if not exists lease_owner text;
+alter table jobs add column if not exists lease_expires_at timestamptz;
+alter table jobs add column if not exists attempts int default 0;
+
+create index if not exists idx_jobs_pending on jobs(created_at) where status = 'pending';
+create index if not exists idx_jobs_lease on jobs(lease_expires_at) where status = 'running';
+
+-- CPU and memory a job reserves on the runner that claims it
+alter table jobs add column if not exists cpus numeric not null default 1;
+alter table jobs add column if not exists memory_mb int not null default 2048;
+
+-- Atomically lease the oldest pending job (or one whose runner stopped heartbeating)
+-- that fits in the runner's free CPU and memory and needs only labels the runner has
+drop function if exists claim_job(text, int, int);
+drop function if exists claim_job(text, int, int, numeric, int);
+drop function if exists claim_job(text, int, int, numeric, int, text[]);
+create or replace function claim_job(p_worker text, p_lease_seconds int, p_max_attempts int default 3,
+                                     p_max_cpus numeric default null, p_max_memory_mb int default null,
+                                     p_labels text[] default null, p_total_cpus numeric default null,
+                                     p_total_memory_mb int default null, p_starve_seconds int default null)
+returns setof jobs
+language plpgsql
+as $$
+declare
+  abandoned uuid;
+  head_cpus numeric;
+  head_memory_mb int;
+begin
+  -- Give up on jobs that keep losing their runner
+  for abandoned in
+    update jobs
+       set status = 'failed', finished_at = now(), lease_owner = null, lease_expires_at = null
+     where status = 'running'
+       and lease_expires_at < now()
+       and attempts >= p_max_attempts
+    returning id
+  loop
+    perform record_job_rollup(abandoned);
+  end loop;
+
+  -- Once the oldest job this runner could ever fit has waited p_starve_seconds, hold newer
+  -- jobs back until enough of the runner's capacity frees up for it
+  if p_starve_seconds is not null then
+    select cpus, memory_mb into head_cpus, head_memory_mb from jobs
+     where status = 'pending'
+       and (not_before is null or not_before <= now())
+       and created_at < now() - make_interval(secs => p_starve_seconds)
+       and (p_total_cpus is null or cpus <= p_total_cpus)
+       and (p_total_memory_mb is null or memory_mb <= p_total_memory_mb)
+       and (p_labels is null or labels <@ p_labels)
+     order by created_at
+     limit 1;
+    if found and (head_cpus > p_max_cpus or head_memory_mb > p_max_memory_mb) then
+      return;
+    end if;
+  end if;
+
+  return query
+  update jobs
+     set status = 'running',
+         started_at = now(),
+         lease_owner = p_worker,
+         lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+         attempts = coalesce(attempts, 0) + 1
+   where id = (
+     select id from jobs
+      where ((status = 'pending' and (not_before is null or not_before <= now()))
+             or (status = 'running' and lease_expires_at < now()))
+        and (p_max_cpus is null or cpus <= p_max_cpus)
+        and (p_max_memory_mb is null or memory_mb <= p_max_memory_mb)
+        and (p_labels is null or labels <@ p_labels)
+      order by created_at
+      limit 1
+      for update skip locked
+   )
+  returning *;
+end;
+$$;
+
+-- Extend every lease held by a runner; returns the jobs it still owns
+create or replace function renew_job_leases(p_worker text, p_lease_seconds int)
+returns table (id uuid)
+language sql
+as $$
+  update jobs
+     set lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+   where lease_owner = p_worker
+     and status = 'running'
+  returning jobs.id;
+$$;
+
+-- Pipeline step that produced a log line (null for job-level messages)
+alter table job_logs add column if not exists step text;
+
+-- Monotonic sequence for keyset pagination of a job's log lines
+alter table job_logs add column if not exists seq bigint generated always as identity;
+create index if not exists idx_job_logs_job_seq on job_logs(job_id, seq);
+
+-- Logs of finished jobs, compacted into compressed blocks of lines
+create table if not exists job_log_chunks (
+  job_id uuid references jobs(id) on delete cascade,
+  chunk int not null,
+  first_seq bigint not null,
+  last_seq bigint not null,
+  line_count int not null,
+  encoding text not null default 'gzip', -- base64 of compressed JSON lines
+  data text not null,
+  primary key (job_id, chunk)
+);
+
+create index if not exists idx_job_log_chunks_seq on job_log_chunks(job_id, last_seq);
+
+alter table jobs add column if not exists logs_archived_at timestamptz;
+create index if not exists idx_jobs_unarchived on jobs(finished_at) where logs_archived_at is null;
+
+-- Dashboard rollups, updated once per job when it reaches a terminal status
+create table if not exists job_rollups (
+  user_id uuid references users(id) on delete cascade,
+  day date not null,            -- UTC date of created_at
+  hour smallint not null,       -- UTC hour of created_at
+  status text not null,
+  repo_url text not null,
+  job_count int not null default 0,
+  duration_count int not null default 0,
+  duration_sum double precision not null default 0,
+  -- Counts per duration bucket; upper bounds in seconds are
+  -- 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, infinity
+  duration_hist int[] not null default array_fill(0, array[15]),
+  primary key (user_id, day, hour, status, repo_url)
+);
+
+create index if not exists idx_job_rollups_day on job_rollups(day);
+
+alter table jobs add column if not exists rolled_up boolean not null default false;
+
+create or replace function record_job_rollup(p_job_id uuid)
+returns void
+language plpgsql
+as $$
+declare
+  j jobs%rowtype;
+  duration double precision;
+  bounds double precision[] := array[1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200];
+  hist int[] := array_fill(0, array[15]);
+  bucket int := 15;
+begin
+  -- Count each job once, even if its final status is written twice
+  update jobs set rolled_up = true
+   where id = p_job_id and not rolled_up and status in ('success', 'failed', 'cancelled')
+  returning * into j;
+  if not found then
+    return;
+  end if;
+
+  duration := extract(epoch from (j.finished_at - j.started_at));
+  if duration is not null then
+    for i in 1..array_length(bounds, 1) loop
+      if duration <= bounds[i] then
+        bucket := i;
+        exit;
+      end if;
+    end loop;
+    hist[bucket] := 1;
+  end if;
+
+  insert into job_rollups as r (user_id, day, hour, status, repo_url, job_count,
+                                duration_count, duration_sum, duration_hist)
+  values (j.user_id,
+          (j.created_at at time zone 'utc')::date,
+          extract(hour from j.created_at at time zone 'utc'),
+          j.status,
+          j.repo_url,
+          1,
+          case when duration is null then 0 else 1 end,
+          coalesce(duration, 0),
+          hist)
+  on conflict (user_id, day, hour, status, repo_url) do update
+     set job_count = r.job_count + 1,
+         duration_count = r.duration_count + excluded.duration_count,
+         duration_sum = r.duration_sum + excluded.duration_sum,
+         duration_hist = (select array_agg(a + b order by n)
+                            from unnest(r.duration_hist, excluded.duration_hist)
+                                 with ordinality as t(a, b, n));
+end;
+$$;
+
+-- Recompute every rollup from the jobs table (after seeding or a schema change)
+create or replace function rebuild_job_rollups()
+returns void
+language plpgsql
+as $$
+declare
+  job_id uuid;
+begin
+  delete from job_rollups where true;
+  update jobs set rolled_up = false where rolled_up;
+  for job_id in select id from jobs where status in ('success', 'failed', 'cancelled') loop
+    perform record_job_rollup(job_id);
+  end loop;
+end;
+$$;
+
+-- Dashboard data versions, bumped whenever a user's jobs change; the all-users view
+-- uses their sum, so no single row is written by every job
+create table if not exists data_versions (
+  scope text primary key,
+  version bigint not null default 0
+);
+
+delete from data_versions where scope = 'all';
+
+create or replace function bump_data_version()
+returns trigger
+language plpgsql
+as $$
+declare
+  owner uuid := coalesce(new.user_id, old.user_id);
+begin
+  insert into data_versions as v (scope, version)
+  values (coalesce(owner::text, 'none'), 1)
+  on conflict (scope) do update set version = v.version + 1;
+  return null;
+end;
+$$;
+
+drop trigger if exists jobs_bump_data_version on jobs;
+create trigger jobs_bump_data_version
+  after insert or delete or update of status on jobs
+  for each row execute function bump_data_version();
+
+-- Owner copied onto each log line so a user's recent activity is one index range scan
+alter table job_logs add column if not exists user_id uuid references users(id) on delete cascade;
+
+create or replace function set_job_log_owner()
+returns trigger
+language plpgsql
+as $$
+begin
+  if new.user_id is null then
+    select user_id into new.user_id from jobs where id = new.job_id;
+  end if;
+  return new;
+end;
+$$;
+
+drop trigger if exists job_logs_set_owner on job_logs;
+create trigger job_logs_set_owner
+  before insert on job_logs
+  for each row execute function set_job_log_owner();
+
+update job_logs l set user_id = j.user_id
+  from jobs j
+  where l.job_id = j.id and l.user_id is null and j.user_id is not null;
+
+create index if not exists idx_job_logs_user_recent on job_logs(user_id, created_at desc);
+create index if not exists idx_job_logs_recent on job_logs(created_at desc);
+
+-- Keyset pagination of a user's jobs, newest first
+create index if not exists idx_jobs_user_created on jobs(user_id, created_at desc, id desc);
+
+-- Push webhooks: one per user and repository, verified with a shared secret
+create table if not exists webhooks (
+  id uuid primary key default gen_random_uuid(),
+  user_id uuid references users(id) on delete cascade,
+  repo_url text not null,
+  secret text not null,
+  created_at timestamptz default now()
+);
+
+create index if not exists idx_webhooks_user_id on webhooks(user_id);
+
+-- What started a job, and the earliest time a runner may claim it (push debounce)
+alter table jobs add column if not exists trigger text default 'manual'; -- manual, retry, push
+alter table jobs add column if not exists commit_sha text;
+alter table jobs add column if not exists not_before timestamptz;
+
+create index if not exists idx_jobs_branch_active on jobs(user_id, repo_url, branch, created_at)
+  where status in ('pending', 'running');
+
+-- Successful builds by commit and resolved steps, so identical runs can be skipped
+create table if not exists build_cache (
+  repo_url text not null,
+  commit_sha text not null,
+  config_hash text not null,
+  job_id uuid references jobs(id) on delete cascade,
+  created_at timestamptz default now(),
+  primary key (repo_url, commit_sha, config_hash)
+);
+
+alter table jobs add column if not exists force boolean not null default false;
+alter table jobs add column if not exists cached_from uuid references jobs(id) on delete set null;
+
+-- Timed stages of each job: queue wait, clone, config, deps, each command, cleanup
+create table if not exists job_steps (
+  id bigint generated always as identity primary key,
+  job_id uuid references jobs(id) on delete cascade,
+  user_id uuid references users(id) on delete cascade,
+  repo_url text,
+  kind text not null,
+  name text,           -- the command, for kind = 'command'
+  step text,           -- pipeline step the command belongs to
+  started_at timestamptz not null,
+  duration_ms int not null,
+  status text,         -- success, failed
+  exit_code int
+);
+
+create index if not exists idx_job_steps_job on job_steps(job_id, started_at);
+create index if not exists idx_job_steps_user_recent on job_steps(user_id, started_at desc);
+
+drop trigger if exists job_steps_set_owner on job_steps;
+create trigger job_steps_set_owner
+  before insert on job_steps
+  for each row execute function set_job_log_owner();
+
+-- Labels a job needs its runner to have (e.g. python, node, large)
+alter table jobs add column if not exists labels text[] not null default '{}';
+
+-- Runner agents that lease jobs over HTTP; their leases are owned by 'runner:<id>'
+create table if not exists runners (
+  id uuid primary key default gen_random_uuid(),
+  name text not null,
+  labels text[] not null default '{}',
+  cpus numeric,
+  memory_mb int,
+  created_at timestamptz default now(),
+  last_seen_at timestamptz default now()
+);
+
+-- Agent that ran a job; kept after the lease ends so it can still upload the job's timings
+alter table jobs add column if not exists runner_id uuid references runners(id) on delete set null;
+
+-- Take a deleted job back out of its rollup, so the dashboard stops counting it
+create or replace function retract_job_rollup()
+returns trigger
+language plpgsql
+as $$
+declare
+  duration double precision := extract(epoch from (old.finished_at - old.started_at));
+  bounds double precision[] := array[1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200];
+  bucket int := 15;
+begin
+  if duration is not null then
+    for i in 1..array_length(bounds, 1) loop
+      if duration <= bounds[i] then
+        bucket := i;
+        exit;
+      end if;
+    end loop;
+  end if;
+
+  update job_rollups
+     set job_count = job_count - 1,
+         duration_count = duration_count - case when duration is null then 0 else 1 end,
+         duration_sum = duration_sum - coalesce(duration, 0),
+         duration_hist[bucket] = duration_hist[bucket] - case when duration is null then 0 else 1 end
+   where user_id = old.user_id
+     and day = (old.created_at at time zone 'utc')::date
+     and hour = extract(hour from old.created_at at time zone 'utc')
+     and status = old.status
+     and repo_url = old.repo_url;
+
+  delete from job_rollups
+   where user_id = old.user_id
+     and day = (old.created_at at time zone 'utc')::date
+     and hour = extract(hour from old.created_at at time zone 'utc')
+     and status = old.status
+     and repo_url = old.repo_url
+     and job_count <= 0;
+  return null;
+end;
+$$;
+
+drop trigger if exists jobs_retract_rollup on jobs;
+create trigger jobs_retract_rollup
+  after delete on jobs
+  for each row when (old.rolled_up) execute function retract_job_rollup();
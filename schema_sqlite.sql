@@ -0,0 +1,194 @@
+-- SQLite version of schema.sql for STORAGE_BACKEND=sqlite (applied automatically on startup).
+-- Column types name the Postgres type so the backend can convert values the way PostgREST does;
+-- uuid keys are generated by the backend and the functions in schema.sql live in storage/sqlite.py.
+
+create table if not exists users (
+  id uuid primary key,
+  email text unique not null,
+  password_hash text not null,
+  created_at timestamptz default (strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00')
+);
+
+create table if not exists jobs (
+  id uuid primary key,
+  user_id uuid references users(id) on delete cascade,
+  repo_url text not null,
+  branch text default 'main',
+  status text default 'pending', -- pending, running, success, failed, cancelled
+  created_at timestamptz default (strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00'),
+  started_at timestamptz,
+  finished_at timestamptz,
+  lease_owner text,
+  lease_expires_at timestamptz,
+  attempts int default 0,
+  cpus numeric not null default 1,
+  memory_mb int not null default 2048,
+  logs_archived_at timestamptz,
+  rolled_up boolean not null default 0,
+  trigger text default 'manual', -- manual, retry, push
+  commit_sha text,
+  not_before timestamptz,
+  force boolean not null default 0,
+  cached_from uuid references jobs(id) on delete set null,
+  labels json not null default '[]',
+  runner_id uuid references runners(id) on delete set null
+);
+
+create index if not exists idx_jobs_user_id on jobs(user_id);
+create index if not exists idx_jobs_status on jobs(status);
+create index if not exists idx_jobs_pending on jobs(created_at) where status = 'pending';
+create index if not exists idx_jobs_lease on jobs(lease_expires_at) where status = 'running';
+create index if not exists idx_jobs_unarchived on jobs(finished_at) where logs_archived_at is null;
+create index if not exists idx_jobs_user_created on jobs(user_id, created_at desc, id desc);
+create index if not exists idx_jobs_branch_active on jobs(user_id, repo_url, branch, created_at)
+  where status in ('pending', 'running');
+
+create table if not exists job_logs (
+  seq integer primary key autoincrement,
+  id uuid unique not null,
+  job_id uuid references jobs(id) on delete cascade,
+  user_id uuid references users(id) on delete cascade,
+  message text,
+  level text default 'info', -- info, error, warn
+  step text,
+  created_at timestamptz default (strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00')
+);
+
+create index if not exists idx_job_logs_job_id on job_logs(job_id);
+create index if not exists idx_job_logs_job_seq on job_logs(job_id, seq);
+create index if not exists idx_job_logs_user_recent on job_logs(user_id, created_at desc);
+create index if not exists idx_job_logs_recent on job_logs(created_at desc);
+
+create table if not exists job_log_chunks (
+  job_id uuid references jobs(id) on delete cascade,
+  chunk int not null,
+  first_seq bigint not null,
+  last_seq bigint not null,
+  line_count int not null,
+  encoding text not null default 'gzip',
+  data text not null,
+  primary key (job_id, chunk)
+);
+
+create index if not exists idx_job_log_chunks_seq on job_log_chunks(job_id, last_seq);
+
+create table if not exists job_rollups (
+  user_id uuid references users(id) on delete cascade,
+  day date not null,
+  hour smallint not null,
+  status text not null,
+  repo_url text not null,
+  job_count int not null default 0,
+  duration_count int not null default 0,
+  duration_sum real not null default 0,
+  duration_hist json not null default '[0,0,0,0,0,0,0,0,0,0,0,0,0,0,0]',
+  primary key (user_id, day, hour, status, repo_url)
+);
+
+create index if not exists idx_job_rollups_day on job_rollups(day);
+
+create table if not exists data_versions (
+  scope text primary key,
+  version bigint not null default 0
+);
+
+create table if not exists webhooks (
+  id uuid primary key,
+  user_id uuid references users(id) on delete cascade,
+  repo_url text not null,
+  secret text not null,
+  created_at timestamptz default (strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00')
+);
+
+create index if not exists idx_webhooks_user_id on webhooks(user_id);
+
+create table if not exists build_cache (
+  repo_url text not null,
+  commit_sha text not null,
+  config_hash text not null,
+  job_id uuid references jobs(id) on delete cascade,
+  created_at timestamptz default (strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00'),
+  primary key (repo_url, commit_sha, config_hash)
+);
+
+create table if not exists runners (
+  id uuid primary key,
+  name text not null,
+  labels json not null default '[]',
+  cpus numeric,
+  memory_mb int,
+  created_at timestamptz default (strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00'),
+  last_seen_at timestamptz default (strftime('%Y-%m-%dT%H:%M:%f', 'now') || '000+00:00')
+);
+
+create table if not exists job_steps (
+  id integer primary key autoincrement,
+  job_id uuid references jobs(id) on delete cascade,
+  user_id uuid references users(id) on delete cascade,
+  repo_url text,
+  kind text not null,
+  name text,
+  step text,
+  started_at timestamptz not null,
+  duration_ms int not null,
+  status text,
+  exit_code int
+);
+
+create index if not exists idx_job_steps_job on job_steps(job_id, started_at);
+create index if not exists idx_job_steps_user_recent on job_steps(user_id, started_at desc);
+
+-- Dashboard data versions, bumped whenever a user's jobs change (the all-users view sums them)
+delete from data_versions where scope = 'all';
+
+drop trigger if exists jobs_bump_data_version_insert;
+create trigger jobs_bump_data_version_insert after insert on jobs
+begin
+  insert into data_versions (scope, version) values (coalesce(new.user_id, 'none'), 1)
+    on conflict (scope) do update set version = version + 1;
+end;
+
+drop trigger if exists jobs_bump_data_version_update;
+create trigger jobs_bump_data_version_update after update of status on jobs
+begin
+  insert into data_versions (scope, version) values (coalesce(new.user_id, 'none'), 1)
+    on conflict (scope) do update set version = version + 1;
+end;
+
+drop trigger if exists jobs_bump_data_version_delete;
+create trigger jobs_bump_data_version_delete after delete on jobs
+begin
+  insert into data_versions (scope, version) values (coalesce(old.user_id, 'none'), 1)
+    on conflict (scope) do update set version = version + 1;
+end;
+
+-- Take a deleted job back out of its rollup (job_duration and retract_duration_hist are
+-- registered by storage/sqlite.py so buckets match record_job_rollup exactly)
+create trigger if not exists jobs_retract_rollup after delete on jobs
+  when old.rolled_up
+begin
+  update job_rollups
+     set job_count = job_count - 1,
+         duration_count = duration_count - (job_duration(old.started_at, old.finished_at) is not null),
+         duration_sum = duration_sum - coalesce(job_duration(old.started_at, old.finished_at), 0),
+         duration_hist = retract_duration_hist(duration_hist, old.started_at, old.finished_at)
+   where user_id is old.user_id and day = substr(old.created_at, 1, 10)
+     and hour = cast(substr(old.created_at, 12, 2) as int) and status = old.status and repo_url = old.repo_url;
+  delete from job_rollups
+   where user_id is old.user_id and day = substr(old.created_at, 1, 10)
+     and hour = cast(substr(old.created_at, 12, 2) as int) and status = old.status and repo_url = old.repo_url
+     and job_count <= 0;
+end;
+
+-- Owner copied onto log lines and steps (SQLite triggers can't rewrite new, so update after)
+create trigger if not exists job_logs_set_owner after insert on job_logs
+  when new.user_id is null
+begin
+  update job_logs set user_id = (select user_id from jobs where id = new.job_id) where seq = new.seq;
+end;
+
+create trigger if not exists job_steps_set_owner after insert on job_steps
+  when new.user_id is null
+begin
+  update job_steps set user_id = (select user_id from jobs where id = new.job_id) where id = new.id;
+end;
@@ -147,6 +147,10 @@ def main():
     print("\n[2/2] Creating jobs...")
     jobs_count = seed_jobs(user_ids, count=55)
     
+    # Seeded jobs are inserted already finished, so build their rollups here
+    print("\nRebuilding dashboard rollups...")
+    supabase.rpc('rebuild_job_rollups', {}).execute()
+    
     print("\n" + "=" * 50)
     print(f"Seeding complete!")
     print(f"  - Users: {len(user_ids)}")
@@ -0,0 +1,37 @@
+from config import supabase
+
+# Upper bounds (seconds) of job_rollups.duration_hist buckets; keep in sync with schema.sql
+DURATION_BUCKETS = [1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, float('inf')]
+
+def record_terminal(job_id):
+    """Add a finished job to the dashboard rollups (counted once per job)"""
+    try:
+        supabase.rpc('record_job_rollup', {'p_job_id': job_id}).execute()
+    except Exception as e:
+        print(f"Failed to update rollups for job {job_id}: {e}")
+
+def merge_histograms(histograms):
+    """Element-wise sum of duration histograms"""
+    total = [0] * len(DURATION_BUCKETS)
+    for hist in histograms:
+        for i, count in enumerate(hist or []):
+            total[i] += count
+    return total
+
+def histogram_quantile(hist, q):
+    """Estimate the q-quantile of durations by interpolating within buckets"""
+    count = sum(hist)
+    if not count:
+        return None
+
+    rank = q * count
+    seen = 0
+    for i, bucket_count in enumerate(hist):
+        if bucket_count and seen + bucket_count >= rank:
+            lower = DURATION_BUCKETS[i - 1] if i else 0
+            upper = DURATION_BUCKETS[i]
+            if upper == float('inf'):
+                return lower
+            return lower + (upper - lower) * (rank - seen) / bucket_count
+        seen += bucket_count
+    return DURATION_BUCKETS[-2]
@@ -0,0 +1,27 @@
+import json
+import hashlib
+from config import supabase
+
+def config_key(steps):
+    """Hash the resolved pipeline, so equivalent ci.json files share results"""
+    resolved = [[step['name'], step['commands'], sorted(step['needs'])] for step in steps]
+    return hashlib.sha256(json.dumps(resolved).encode('utf-8')).hexdigest()[:16]
+
+def lookup(repo_url, commit_sha, key):
+    """Return the id of a job that already built this commit successfully, or None"""
+    result = supabase.table('build_cache')\
+        .select('job_id')\
+        .eq('repo_url', repo_url)\
+        .eq('commit_sha', commit_sha)\
+        .eq('config_hash', key)\
+        .execute()
+    return result.data[0]['job_id'] if result.data else None
+
+def record(repo_url, commit_sha, key, job_id):
+    """Remember a successful build; the first job to succeed stays the reference"""
+    supabase.table('build_cache').upsert({
+        'repo_url': repo_url,
+        'commit_sha': commit_sha,
+        'config_hash': key,
+        'job_id': job_id
+    }, on_conflict='repo_url,commit_sha,config_hash', ignore_duplicates=True).execute()
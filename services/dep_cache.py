@@ -0,0 +1,112 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+from contextlib import ExitStack
+from config import DEP_CACHE_DIR, DEP_CACHE_MAX_BYTES, DEP_CACHE_EVICT_INTERVAL
+from services.disk import dir_size, path_lock
+
+# Lockfiles that identify a dependency set, and where each toolchain keeps downloads
+TOOLCHAINS = {
+    'pip': {
+        'lockfiles': ['requirements.txt', 'poetry.lock', 'Pipfile.lock', 'pyproject.toml'],
+        'env': lambda d: {'PIP_CACHE_DIR': d}
+    },
+    'npm': {
+        'lockfiles': ['package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml'],
+        'env': lambda d: {
+            'npm_config_cache': os.path.join(d, 'npm'),
+            'YARN_CACHE_FOLDER': os.path.join(d, 'yarn'),
+            'npm_config_store_dir': os.path.join(d, 'pnpm')
+        }
+    },
+    'cargo': {
+        'lockfiles': ['Cargo.lock', 'Cargo.toml'],
+        'env': lambda d: {'CARGO_HOME': d}
+    },
+    'go': {
+        'lockfiles': ['go.sum', 'go.mod'],
+        'env': lambda d: {'GOMODCACHE': os.path.join(d, 'mod'), 'GOCACHE': os.path.join(d, 'build')}
+    },
+    'maven': {
+        'lockfiles': ['pom.xml'],
+        'env': lambda d: {'MAVEN_OPTS': f"{os.getenv('MAVEN_OPTS', '')} -Dmaven.repo.local={d}".strip()}
+    },
+    'gradle': {
+        'lockfiles': ['gradle.lockfile', 'build.gradle', 'build.gradle.kts'],
+        'env': lambda d: {'GRADLE_USER_HOME': d}
+    },
+}
+
+_lock = threading.Lock()
+_last_evicted = None
+
+def prepare(workspace_dir):
+    """Point detected toolchains at their shared caches.
+
+    Returns (env, lease). lease['caches'] lists (toolchain, lockfile hash, warm)
+    for every toolchain found in the workspace; each of those caches stays
+    share-locked, so no process evicts it, until release(lease).
+    """
+    env, caches = {}, []
+    stack = ExitStack()
+    try:
+        for name, toolchain in TOOLCHAINS.items():
+            lockfiles = [os.path.join(workspace_dir, f) for f in toolchain['lockfiles']]
+            lockfiles = [f for f in lockfiles if os.path.isfile(f)]
+            if not lockfiles:
+                continue
+
+            cache_dir = os.path.join(DEP_CACHE_DIR, name)
+            # Waits out an eviction in progress, then keeps the cache from being evicted
+            stack.enter_context(path_lock(cache_dir, shared=True))
+            os.makedirs(cache_dir, exist_ok=True)
+            # Per-lockfile markers from older versions; warm now just means the cache has content
+            shutil.rmtree(os.path.join(cache_dir, '.keys'), ignore_errors=True)
+            warm = any(os.scandir(cache_dir))
+            os.utime(cache_dir)
+
+            env.update(toolchain['env'](cache_dir))
+            caches.append((name, _hash_files(lockfiles), warm))
+    except BaseException:
+        stack.close()
+        raise
+    return env, {'caches': caches, 'stack': stack}
+
+def release(lease):
+    """Unlock the caches from prepare() and enforce the size budget"""
+    lease['stack'].close()
+    evict()
+
+def evict(force=False):
+    """Remove least recently used toolchain caches while over DEP_CACHE_MAX_BYTES"""
+    global _last_evicted
+    with _lock:
+        # Sizing a large cache walks every file, so only do it now and then
+        if not force and _last_evicted and time.monotonic() - _last_evicted < DEP_CACHE_EVICT_INTERVAL:
+            return
+        _last_evicted = time.monotonic()
+
+    if not os.path.isdir(DEP_CACHE_DIR):
+        return
+
+    caches = [(entry.stat().st_mtime, entry.path, dir_size(entry.path))
+              for entry in os.scandir(DEP_CACHE_DIR) if entry.is_dir()]
+    total = sum(size for _, _, size in caches)
+    for _, path, size in sorted(caches):
+        if total <= DEP_CACHE_MAX_BYTES:
+            break
+        with path_lock(path, blocking=False) as acquired:
+            if not acquired:
+                continue  # In use by a job in this or another process
+            shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+def _hash_files(paths):
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
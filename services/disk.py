@@ -0,0 +1,51 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: paths are only locked within this process
+    fcntl = None
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+def dir_size(path):
+    """Total size in bytes of the files under path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+@contextmanager
+def path_lock(path, shared=False, blocking=True):
+    """Lock a path across threads and processes; yields False if not acquired"""
+    if fcntl is None:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(path, threading.Lock())
+        acquired = lock.acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f'{path}.lock', 'w') as lock_file:
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,36 +1,146 @@
 import os
+import re
+import time
 import shutil
-from git import Repo
+import hashlib
+import threading
+from git import Repo, GitCommandError
+from config import GIT_MIRROR_CACHE, GIT_MIRROR_DIR, GIT_MIRROR_MAX_BYTES, GIT_MIRROR_EVICT_INTERVAL
+from services.disk import dir_size, path_lock
+
+SHA = re.compile(r'^[0-9a-f]{7,40}$')
+
+_evict_lock = threading.Lock()
+_last_evicted = None
 
 def clone_repo(repo_url, branch, target_dir):
     """Clone a git repository to target directory"""
+    if GIT_MIRROR_CACHE:
+        try:
+            return _clone_from_mirror(repo_url, branch, target_dir)
+        except Exception as e:
+            print(f"Mirror clone failed, cloning from remote: {e}")
+            shutil.rmtree(target_dir, ignore_errors=True)
+
     os.makedirs(target_dir, exist_ok=True)
-    
+
     repo = Repo.clone_from(
-        repo_url, 
-        target_dir, 
-        branch=branch, 
+        repo_url,
+        target_dir,
+        branch=branch,
         depth=1,
         single_branch=True
     )
     return repo
 
+def _clone_from_mirror(repo_url, branch, target_dir):
+    """Refresh the local mirror of repo_url and check the branch out from it"""
+    mirror_dir = _update_mirror(repo_url)
+
+    with path_lock(mirror_dir, shared=True):
+        # Local clones hardlink objects, so this is a checkout rather than a download
+        repo = Repo.clone_from(mirror_dir, target_dir, branch=branch, single_branch=True)
+        os.utime(mirror_dir)
+    repo.remotes.origin.set_url(repo_url)
+
+    _evict_mirrors(keep=mirror_dir)
+    return repo
+
+def _update_mirror(repo_url):
+    """Create or incrementally fetch the bare mirror for a repository"""
+    mirror_dir = _mirror_path(repo_url)
+
+    with path_lock(mirror_dir):
+        if os.path.isdir(mirror_dir):
+            Repo(mirror_dir).git.fetch('--prune', 'origin')
+        else:
+            os.makedirs(GIT_MIRROR_DIR, exist_ok=True)
+            partial_dir = f'{mirror_dir}.partial'
+            shutil.rmtree(partial_dir, ignore_errors=True)
+            Repo.clone_from(repo_url, partial_dir, mirror=True)
+            os.rename(partial_dir, mirror_dir)
+    return mirror_dir
+
+def _mirror_path(repo_url):
+    name = repo_url.rstrip('/').split('/')[-1].removesuffix('.git') or 'repo'
+    digest = hashlib.sha256(repo_url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(GIT_MIRROR_DIR, f'{name}-{digest}.git')
+
+def _evict_mirrors(keep=None, force=False):
+    """Remove least recently used mirrors until the cache fits its size budget"""
+    global _last_evicted
+    with _evict_lock:
+        # Sizing every mirror walks all their objects, so only do it now and then
+        if not force and _last_evicted and time.monotonic() - _last_evicted < GIT_MIRROR_EVICT_INTERVAL:
+            return
+        _last_evicted = time.monotonic()
+
+    if not os.path.isdir(GIT_MIRROR_DIR):
+        return
+
+    mirrors = []
+    for entry in os.scandir(GIT_MIRROR_DIR):
+        if entry.is_dir() and entry.name.endswith('.git'):
+            mirrors.append((entry.stat().st_mtime, entry.path, dir_size(entry.path)))
+
+    total = sum(size for _, _, size in mirrors)
+    for _, path, size in sorted(mirrors):
+        if total <= GIT_MIRROR_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        with path_lock(path, blocking=False) as acquired:
+            if not acquired:
+                continue  # In use by another job
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+def sync_workspace(repo_url, branch, target_dir, preserve=()):
+    """Bring an existing checkout to the tip of branch, keeping untracked dirs in preserve"""
+    repo = Repo(target_dir)
+    source = repo_url
+    if GIT_MIRROR_CACHE:
+        try:
+            source = _update_mirror(repo_url)
+        except Exception as e:
+            print(f"Mirror update failed, fetching from remote: {e}")
+
+    if source == repo_url:
+        repo.git.fetch('origin', branch)
+    else:
+        with path_lock(source, shared=True):
+            repo.git.fetch(source, branch)
+            os.utime(source)
+    repo.git.checkout('--force', '-B', branch, 'FETCH_HEAD')
+    repo.git.reset('--hard', 'FETCH_HEAD')
+    # -x also drops ignored files; -e keeps build outputs for incremental builds
+    excludes = [arg for name in preserve for arg in ('-e', name)]
+    repo.git.clean('-ffdx', *excludes)
+    return repo
+
+def checkout_commit(target_dir, sha):
+    """Detach a checkout at sha, fetching it if the clone is too shallow to have it"""
+    if not SHA.match(sha or ''):
+        raise ValueError(f'Not a commit sha: {sha!r}')
+    repo = Repo(target_dir)
+    if repo.head.commit.hexsha.startswith(sha):
+        return repo
+    try:
+        repo.git.checkout('--force', '--detach', sha)
+    except GitCommandError:
+        repo.git.fetch('--depth=1', 'origin', sha)
+        repo.git.checkout('--force', '--detach', 'FETCH_HEAD')
+    return repo
+
 def get_repo_info(repo_path):
     """Get latest commit info from cloned repo"""
     repo = Repo(repo_path)
     commit = repo.head.commit
-    
+
     return {
         'commit': commit.hexsha[:7],
+        'sha': commit.hexsha,
         'message': commit.message.strip(),
         'author': commit.author.name,
         'date': commit.committed_datetime.isoformat()
     }
-
-def cleanup_workspace(workspace_dir):
-    """Remove workspace directory"""
-    try:
-        if os.path.exists(workspace_dir):
-            shutil.rmtree(workspace_dir)
-    except Exception as e:
-        print(f"Failed to cleanup workspace: {e}")
@@ -0,0 +1,79 @@
+import os
+import re
+import socket
+import threading
+from config import supabase, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_STARVATION_SECONDS
+
+LABEL = re.compile(r'^[A-Za-z0-9_.-]{1,32}$')
+MAX_LABELS = 16
+
+# Signalled when this process queues a job, so waiting runners and long-polls claim at once
+_queued = threading.Condition()
+
+def worker_id():
+    """Identify this process as a lease owner"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def claim_job(max_cpus=None, max_memory_mb=None, labels=None, worker=None, total_cpus=None, total_memory_mb=None):
+    """Lease the next pending job that fits the given budget and labels, or return None.
+
+    labels=None matches any job; a list matches jobs whose labels it contains.
+    worker defaults to this process (remote runners lease as 'runner:<id>').
+    total_cpus/total_memory_mb are the runner's whole capacity: a job that fits
+    them but has waited JOB_STARVATION_SECONDS is not passed over for newer ones.
+    """
+    result = supabase.rpc('claim_job', {
+        'p_worker': worker or worker_id(),
+        'p_lease_seconds': JOB_LEASE_SECONDS,
+        'p_max_attempts': JOB_MAX_ATTEMPTS,
+        'p_max_cpus': max_cpus,
+        'p_max_memory_mb': max_memory_mb,
+        'p_labels': labels,
+        'p_total_cpus': total_cpus,
+        'p_total_memory_mb': total_memory_mb,
+        'p_starve_seconds': JOB_STARVATION_SECONDS or None
+    }).execute()
+    return result.data[0] if result.data else None
+
+def renew_leases(worker=None):
+    """Extend a worker's leases (this process by default) and return the ids of jobs it still owns"""
+    result = supabase.rpc('renew_job_leases', {
+        'p_worker': worker or worker_id(),
+        'p_lease_seconds': JOB_LEASE_SECONDS
+    }).execute()
+    return {row['id'] for row in result.data or []}
+
+def pending_count():
+    """Number of jobs waiting for a runner across all processes"""
+    result = supabase.table('jobs')\
+        .select('id', count='exact', head=True)\
+        .eq('status', 'pending')\
+        .execute()
+    return result.count or 0
+
+def notify_queued():
+    """Wake anything in this process waiting for a job to be queued"""
+    with _queued:
+        _queued.notify_all()
+
+def wait_for_queued(timeout):
+    """Wait up to timeout for this process to queue a job.
+
+    Jobs queued by other processes are not signalled, so callers still
+    poll the table when this times out.
+    """
+    with _queued:
+        return _queued.wait(timeout)
+
+def parse_labels(value):
+    """Normalise a list of runner/job labels; returns (labels, error)"""
+    if value is None:
+        return [], None
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or len(value) > MAX_LABELS:
+        return None, f'labels must be a list of at most {MAX_LABELS} names'
+    labels = sorted({str(label).strip() for label in value if str(label).strip()})
+    if not all(LABEL.match(label) for label in labels):
+        return None, 'labels may only contain letters, digits, ".", "_" and "-" (up to 32 characters)'
+    return labels, None
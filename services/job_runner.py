@@ -1,92 +1,208 @@
 import os
 import json
+import signal
 import subprocess
 import threading
 from datetime import datetime
-from config import supabase, WORKSPACE_DIR
-from services.git_service import clone_repo, get_repo_info, cleanup_workspace
+from config import (
+    WORKSPACE_DIR, MAX_CONCURRENT_JOBS, JOB_KILL_GRACE_SECONDS, DEP_CACHE_ENABLED,
+    JOB_MAX_PARALLEL_STEPS, BUILD_CACHE_ENABLED, WORKSPACE_POOL_ENABLED, HOST_CPUS, HOST_MEMORY_MB
+)
+from services.git_service import clone_repo, checkout_commit, get_repo_info
+from services.scheduler import JobScheduler
+from services.pipeline import parse_steps, run_steps
+from services import (
+    log_sink, job_queue, job_store, dep_cache, analytics, build_cache, workspace_pool, workspace_gc, resources,
+    timings, metrics
+)
 
-# Track running jobs
+# Jobs executing in this process
 running_jobs = {}
 
-def start_job(job_id, repo_url, branch):
-    """Start job execution in background thread"""
-    thread = threading.Thread(target=_run_job, args=(job_id, repo_url, branch))
-    thread.start()
-    running_jobs[job_id] = thread
+def start_job(job_id):
+    """Wake a runner (in this process, or long-polling from an agent) for a job already queued as pending"""
+    scheduler.wake()
+    job_queue.notify_queued()
 
-def _run_job(job_id, repo_url, branch):
-    """Execute the job pipeline"""
-    workspace_dir = os.path.join(WORKSPACE_DIR, job_id)
+def _run_job(job):
+    """Execute the job pipeline for a leased job row"""
+    job_id, repo_url, branch = job['id'], job['repo_url'], job['branch']
+    workspace = workspace_pool.acquire(repo_url, branch) if WORKSPACE_POOL_ENABLED else None
+    workspace_dir = workspace['path'] if workspace else os.path.join(WORKSPACE_DIR, job_id)
+    cpus, memory_mb = resources.budget(job)
+    running_jobs[job_id] = {
+        'thread': threading.current_thread(),
+        'stop': threading.Event(),
+        'processes': set(),
+        'env': resources.parallelism_env(cpus),
+        'dep_caches': None,
+        'memory_mb': memory_mb,
+        'cgroup': resources.create_cgroup(job_id, cpus, memory_mb)
+    }
+    log_sink.open_sink(job_id)
+    timings.record_queue_wait(job)
     
     try:
-        # Update status to running
-        _update_job_status(job_id, 'running')
+        _add_log(job_id, f"Resources: {cpus:g} CPU, {memory_mb} MB"
+                         f"{' (cgroup)' if running_jobs[job_id]['cgroup'] else ''}", 'info')
+        if (job.get('attempts') or 1) > 1:
+            _add_log(job_id, f"Previous runner stopped responding, retrying (attempt {job['attempts']})", 'warn')
         _add_log(job_id, f'Starting job for {repo_url} (branch: {branch})', 'info')
+        if job.get('commit_sha'):
+            _add_log(job_id, f"Triggered by push of {job['commit_sha'][:7]}", 'info')
         
-        # Clone repository
-        _add_log(job_id, 'Cloning repository...', 'info')
-        clone_repo(repo_url, branch, workspace_dir)
+        # Clone repository, or refresh a warm workspace from the pool
+        span = timings.start(job_id, 'clone')
+        if workspace:
+            _add_log(job_id, 'Updating pooled workspace...', 'info')
+            workspace_pool.prepare(workspace, repo_url, branch)
+            if workspace['warm']:
+                _add_log(job_id, 'Reusing warm workspace', 'info')
+        else:
+            _add_log(job_id, 'Cloning repository...', 'info')
+            clone_repo(repo_url, branch, workspace_dir)
+        if job.get('commit_sha'):
+            # Build what was pushed, even if the branch has moved on since
+            try:
+                checkout_commit(workspace_dir, job['commit_sha'])
+            except Exception as e:
+                _add_log(job_id, f"Could not check out {job['commit_sha'][:7]}, building the branch tip instead: {e}", 'warn')
+        timings.finish(span)
         
         repo_info = get_repo_info(workspace_dir)
         _add_log(job_id, f"Cloned commit: {repo_info['commit']} - {repo_info['message']}", 'info')
         
         # Check for CI config or auto-detect project type
+        span = timings.start(job_id, 'config')
         ci_config_path = os.path.join(workspace_dir, 'ci.json')
-        commands = None
+        ci_config = None
         
         if os.path.exists(ci_config_path):
             try:
                 with open(ci_config_path, 'r', encoding='utf-8') as f:
                     ci_config = json.load(f)
-                    commands = ci_config.get('commands', [])
                 _add_log(job_id, 'Found ci.json config', 'info')
             except Exception as e:
                 _add_log(job_id, f'Error reading ci.json: {str(e)}', 'error')
-                commands = _detect_project_commands(workspace_dir)
+                ci_config = {'commands': _detect_project_commands(workspace_dir)}
         else:
             # Auto-detect project type
-            commands = _detect_project_commands(workspace_dir)
+            ci_config = {'commands': _detect_project_commands(workspace_dir)}
             _add_log(job_id, f'Auto-detected project type', 'info')
             
             # Create and save ci.json for future runs
             try:
-                ci_config = {'commands': commands}
                 with open(ci_config_path, 'w', encoding='utf-8') as f:
                     json.dump(ci_config, f, indent=2)
                 _add_log(job_id, 'Generated ci.json for this project', 'info')
             except Exception as e:
                 _add_log(job_id, f'Could not save ci.json: {str(e)}', 'warn')
         
-        if not commands:
+        steps = parse_steps(ci_config)
+        timings.finish(span)
+        if not any(step['commands'] for step in steps):
             _add_log(job_id, 'No commands to run', 'warn')
-            _update_job_status(job_id, 'success')
+            _finish_job(job_id, 'success')
             return
         
-        # Execute commands
-        for cmd in commands:
-            _add_log(job_id, f'Running: {cmd}', 'info')
-            success = _execute_command(job_id, cmd, workspace_dir)
-            
-            if not success:
-                _update_job_status(job_id, 'failed')
-                _add_log(job_id, 'Job failed', 'error')
-                cleanup_workspace(workspace_dir)
+        cache_key = build_cache.config_key(steps)
+        if BUILD_CACHE_ENABLED and not job.get('force'):
+            cached_from = job_store.lookup_build(job_id, repo_url, repo_info['sha'], cache_key)
+            if cached_from:
+                _add_log(job_id, f"Commit {repo_info['commit']} already built successfully with these steps "
+                                 f"in job {cached_from} (logs: /api/jobs/{cached_from}/logs); "
+                                 f"skipping. Run with force to rebuild.", 'info')
+                _finish_job(job_id, 'success', cached_from=cached_from)
                 return
         
-        _update_job_status(job_id, 'success')
+        if DEP_CACHE_ENABLED:
+            _prepare_dep_caches(job_id, workspace_dir)
+        
+        # Execute steps, independent ones in parallel
+        max_parallel = min(int(ci_config.get('max_parallel', JOB_MAX_PARALLEL_STEPS)), JOB_MAX_PARALLEL_STEPS)
+        results = run_steps(
+            steps,
+            lambda step, abort: _run_step(job_id, step, workspace_dir, abort),
+            max_parallel=max_parallel,
+            fail_fast=ci_config.get('fail_fast', True),
+            on_abort=lambda: _kill_processes(job_id),
+            should_stop=lambda: _stopped(job_id)
+        )
+        
+        if _stopped(job_id):
+            _add_log(job_id, 'Job stopped', 'warn')
+            return
+        
+        for step in steps:
+            if step['name'] and results.get(step['name']) != 'success':
+                _add_log(job_id, f"Step {step['name']}: {results.get(step['name'])}", 'warn', step=step['name'])
+        
+        if any(outcome != 'success' for outcome in results.values()):
+            _add_log(job_id, 'Job failed', 'error')
+            _finish_job(job_id, 'failed')
+            return
+        
         _add_log(job_id, 'Job completed successfully', 'info')
+        if _finish_job(job_id, 'success') and BUILD_CACHE_ENABLED:
+            job_store.record_build(job_id, repo_url, repo_info['sha'], cache_key)
         
     except Exception as e:
         _add_log(job_id, f'Error: {str(e)}', 'error')
-        _update_job_status(job_id, 'failed')
+        _finish_job(job_id, 'failed')
     finally:
-        cleanup_workspace(workspace_dir)
-        running_jobs.pop(job_id, None)
+        span = timings.start(job_id, 'cleanup')
+        if workspace:
+            workspace_pool.release(workspace)
+        else:
+            workspace_gc.discard(workspace_dir)
+        job_state = running_jobs.pop(job_id, None)
+        if job_state and job_state['dep_caches']:
+            dep_cache.release(job_state['dep_caches'])
+        if job_state:
+            resources.remove_cgroup(job_state['cgroup'])
+        timings.finish(span)
+        timings.save(job_id, repo_url)
+        log_sink.close_sink(job_id)
+
+def _run_step(job_id, step, workspace_dir, abort=None):
+    """Run a step's commands in order; returns False at the first failure or once aborted"""
+    name = step['name']
+    for cmd in step['commands']:
+        if _stopped(job_id) or (abort and abort.is_set()):
+            return False
+        
+        _add_log(job_id, f'Running: {cmd}', 'info', step=name)
+        if not _execute_command(job_id, cmd, workspace_dir, step=name, abort=abort):
+            return False
+    
+    if name:
+        _add_log(job_id, f'Step {name} succeeded', 'info', step=name)
+    return True
 
-def _execute_command(job_id, command, cwd):
+def _prepare_dep_caches(job_id, workspace_dir):
+    """Point package managers at the shared download caches"""
+    job = running_jobs[job_id]
+    span = timings.start(job_id, 'deps')
+    try:
+        env, job['dep_caches'] = dep_cache.prepare(workspace_dir)
+        job['env'].update(env)
+    except Exception as e:
+        _add_log(job_id, f'Dependency cache unavailable: {str(e)}', 'warn')
+        timings.finish(span, 'failed')
+        return
+    timings.finish(span)
+    
+    for name, key, warm in job['dep_caches']['caches']:
+        _add_log(job_id, f"Dependency cache {name}: lockfile {key} ({'warm' if warm else 'cold'})", 'info')
+
+def _execute_command(job_id, command, cwd, step=None, abort=None):
     """Execute a shell command and stream logs"""
+    job = running_jobs.get(job_id)
+    process = None
+    span = timings.start(job_id, 'command', name=command, step=step)
     try:
+        if job:
+            command = resources.limit_command(command, job['memory_mb'], job['cgroup'])
         process = subprocess.Popen(
             command,
             shell=True,
@@ -94,50 +210,132 @@ def _execute_command(job_id, command, cwd):
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
-            env={**os.environ, 'CI': 'true'}
+            env={**os.environ, 'CI': 'true', **(job['env'] if job else {})},
+            # Own process group, so cancelling reaches every child of the shell
+            **_process_group_kwargs()
         )
+        if job:
+            job['processes'].add(process)
+            # Stopped or aborted while starting: the kill may have missed this process
+            if job['stop'].is_set() or (abort and abort.is_set()):
+                _terminate(process)
         
         for line in process.stdout:
             line = line.strip()
             if line:
-                _add_log(job_id, line, 'info')
+                _add_log(job_id, line, 'info', step=step)
         
         process.wait()
+        timings.finish(span, 'success' if process.returncode == 0 else 'failed', process.returncode)
         return process.returncode == 0
         
     except Exception as e:
         _add_log(job_id, f'Process error: {str(e)}', 'error')
+        timings.finish(span, 'failed')
+        return False
+    finally:
+        if job and process:
+            job['processes'].discard(process)
+
+def _process_group_kwargs():
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+def _terminate(process):
+    """SIGTERM the command's process group, then SIGKILL it after a grace period"""
+    if os.name == 'nt':
+        process.kill()
+        return
+    
+    _signal_group(process, signal.SIGTERM)
+    try:
+        process.wait(JOB_KILL_GRACE_SECONDS)
+    except subprocess.TimeoutExpired:
+        pass
+    # Children that ignored SIGTERM keep the group alive after the shell exits
+    _signal_group(process, signal.SIGKILL)
+
+def _signal_group(process, sig):
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def cancel_job(job_id, reason='Job cancelled by user'):
+    """Cancel a pending or running job.
+    
+    A job running in another process notices on its next lease heartbeat.
+    """
+    if not _update_job_status(job_id, 'cancelled', from_statuses=['pending', 'running']):
+        return False
+    
+    _stop_local(job_id)
+    _add_log(job_id, reason, 'warn')
+    return True
+
+def _on_lease_lost(job_id):
+    """Stop a job whose lease was taken away (cancelled or re-leased elsewhere)"""
+    _stop_local(job_id)
+
+def _stop_local(job_id):
+    """Stop the command loop and kill any command the job is running"""
+    job = running_jobs.get(job_id)
+    if not job:
+        return
+    
+    job['stop'].set()
+    _kill_processes(job_id)
+
+def _kill_processes(job_id):
+    """Kill the job's running commands without stopping the job itself"""
+    job = running_jobs.get(job_id)
+    if not job:
+        return
+    
+    for process in list(job['processes']):
+        threading.Thread(target=_terminate, args=(process,), daemon=True).start()
+
+def _stopped(job_id):
+    job = running_jobs.get(job_id)
+    return bool(job and job['stop'].is_set())
+
+def _finish_job(job_id, status, **fields):
+    """Record the outcome of a job, unless this runner no longer owns it"""
+    if _stopped(job_id):
         return False
+    return _update_job_status(job_id, status, owner=job_queue.worker_id(), **fields)
 
-def cancel_job(job_id):
-    """Cancel a running job"""
-    if job_id in running_jobs:
-        # Note: Thread cancellation is limited in Python
-        # For production, use a process-based approach
-        running_jobs.pop(job_id, None)
-        _update_job_status(job_id, 'cancelled')
-        _add_log(job_id, 'Job cancelled by user', 'warn')
-        return True
-    return False
-
-def _update_job_status(job_id, status):
-    """Update job status in database"""
-    updates = {'status': status}
+def complete_remote_job(job_id, status, owner, **fields):
+    """Record the outcome a runner agent reported for a job it holds the lease on"""
+    return _update_job_status(job_id, status, owner=owner, **fields)
+
+def _update_job_status(job_id, status, from_statuses=None, owner=None, **fields):
+    """Update job status in database; returns whether a row was updated"""
+    updates = {'status': status, **fields}
+    
+    if status in ['success', 'failed', 'cancelled']:
+        # Make sure readers that see the final status also see every line
+        log_sink.flush(job_id)
     
     if status == 'running':
         updates['started_at'] = datetime.utcnow().isoformat()
     elif status in ['success', 'failed', 'cancelled']:
         updates['finished_at'] = datetime.utcnow().isoformat()
+        updates['lease_owner'] = None
+        updates['lease_expires_at'] = None
+    
+    updated = job_store.update_job(job_id, updates, from_statuses=from_statuses, owner=owner)
     
-    supabase.table('jobs').update(updates).eq('id', job_id).execute()
+    # A runner agent's server does the bookkeeping when it applies the report
+    if updated and status in ['success', 'failed', 'cancelled'] and not job_store.is_remote():
+        analytics.record_terminal(job_id)
+        metrics.JOBS_FINISHED.labels(status).inc()
+    return updated
 
-def _add_log(job_id, message, level='info'):
-    """Add log entry to database"""
-    supabase.table('job_logs').insert({
-        'job_id': job_id,
-        'message': message,
-        'level': level
-    }).execute()
+def _add_log(job_id, message, level='info', step=None):
+    """Add log entry to database (buffered while the job is running)"""
+    log_sink.write(job_id, message, level, step)
 
 
 def _detect_project_commands(workspace_dir):
@@ -179,3 +377,10 @@ def _detect_project_commands(workspace_dir):
     
     # Default: just list files
     return ['echo "No recognized project type. Add ci.json to configure."', 'dir' if os.name == 'nt' else 'ls -la']
+
+
+scheduler = JobScheduler(
+    MAX_CONCURRENT_JOBS, _run_job, _on_lease_lost,
+    can_claim=workspace_gc.has_room,
+    capacity={'cpus': HOST_CPUS, 'memory_mb': HOST_MEMORY_MB}
+)
@@ -0,0 +1,82 @@
+from config import supabase, RUNNER_LABELS
+from services import job_queue, build_cache
+
+# Set in runner agents: leases, logs and results go to the server over HTTP instead of the database
+_remote = None
+
+def use_remote(client):
+    """Send everything below through a RunnerClient instead of the database"""
+    global _remote
+    _remote = client
+
+def is_remote():
+    return _remote is not None
+
+def claim_job(max_cpus=None, max_memory_mb=None, total_cpus=None, total_memory_mb=None):
+    """Lease the next job this runner can take, or return None"""
+    if _remote:
+        # The server already knows the capacity the agent registered with
+        return _remote.lease(max_cpus, max_memory_mb)
+    return job_queue.claim_job(max_cpus=max_cpus, max_memory_mb=max_memory_mb, labels=RUNNER_LABELS,
+                               total_cpus=total_cpus, total_memory_mb=total_memory_mb)
+
+def renew_leases():
+    """Extend this runner's leases and return the ids of jobs it still owns"""
+    if _remote:
+        return _remote.heartbeat()
+    return job_queue.renew_leases()
+
+def pending_count():
+    """Jobs waiting for a runner, or None where the queue isn't visible"""
+    if _remote:
+        return None
+    return job_queue.pending_count()
+
+def write_logs(job_id, rows):
+    """Write a batch of job_logs rows"""
+    if _remote:
+        _remote.write_logs(job_id, rows)
+        return
+    supabase.table('job_logs').insert(rows).execute()
+
+def save_steps(job_id, rows):
+    """Write a finished job's timed stages"""
+    if _remote:
+        _remote.save_steps(job_id, rows)
+        return
+    supabase.table('job_steps').insert(rows).execute()
+
+def update_job(job_id, updates, from_statuses=None, owner=None):
+    """Apply updates to a job (only from the given statuses / while owned); returns whether it changed.
+
+    Remote runners report the status and the server applies it to the lease they hold.
+    """
+    if _remote:
+        return _remote.report(job_id, updates)
+    query = supabase.table('jobs').update(updates).eq('id', job_id)
+    if from_statuses:
+        query = query.in_('status', from_statuses)
+    if owner:
+        query = query.eq('lease_owner', owner).eq('status', 'running')
+    return bool(query.execute().data)
+
+def lookup_build(job_id, repo_url, commit_sha, key):
+    """Id of a job that already built this commit with these steps, or None"""
+    if _remote:
+        return _remote.lookup_build(job_id, commit_sha, key)
+    return build_cache.lookup(repo_url, commit_sha, key)
+
+def record_build(job_id, repo_url, commit_sha, key):
+    """Remember a successful build"""
+    if _remote:
+        _remote.record_build(job_id, commit_sha, key)
+        return
+    build_cache.record(repo_url, commit_sha, key, job_id)
+
+def running_job_ids(job_ids):
+    """Which of these jobs are still running, for workspace GC"""
+    if _remote:
+        # An agent's workspaces only ever belong to its own jobs
+        return _remote.running_job_ids(job_ids)
+    result = supabase.table('jobs').select('id').in_('id', job_ids).eq('status', 'running').execute()
+    return {row['id'] for row in result.data or []}
@@ -0,0 +1,106 @@
+import gzip
+import json
+import time
+import base64
+import threading
+from datetime import datetime, timedelta
+from config import supabase, LOG_ARCHIVE_AFTER, LOG_ARCHIVE_INTERVAL, LOG_ARCHIVE_CHUNK_LINES
+
+FIELDS = ['seq', 'message', 'level', 'step', 'created_at']
+TERMINAL_STATUSES = ['success', 'failed', 'cancelled']
+
+_archiver = None
+
+def start_archiver():
+    """Periodically archive logs of jobs that finished more than LOG_ARCHIVE_AFTER ago"""
+    global _archiver
+    if _archiver:
+        return
+    _archiver = threading.Thread(target=_archive_loop, name='log-archiver', daemon=True)
+    _archiver.start()
+
+def _archive_loop():
+    while True:
+        time.sleep(LOG_ARCHIVE_INTERVAL)
+        try:
+            archive_finished_jobs()
+        except Exception as e:
+            print(f"Log archival failed: {e}")
+
+def archive_finished_jobs(batch=20):
+    """Archive one batch of finished jobs; returns how many were archived"""
+    cutoff = (datetime.utcnow() - timedelta(seconds=LOG_ARCHIVE_AFTER)).isoformat()
+    result = supabase.table('jobs')\
+        .select('id')\
+        .in_('status', TERMINAL_STATUSES)\
+        .is_('logs_archived_at', 'null')\
+        .lt('finished_at', cutoff)\
+        .order('finished_at', desc=False)\
+        .limit(batch)\
+        .execute()
+
+    for job in result.data or []:
+        archive_job(job['id'])
+    return len(result.data or [])
+
+def archive_job(job_id):
+    """Move a job's log rows into compressed chunks.
+
+    Chunks are upserted before the job is marked archived and the rows are
+    deleted, so a crash or a second archiver at any point is harmless.
+    """
+    chunk, after = 0, None
+    while True:
+        query = supabase.table('job_logs')\
+            .select(','.join(FIELDS))\
+            .eq('job_id', job_id)
+        if after is not None:
+            query = query.gt('seq', after)
+        rows = query.order('seq', desc=False).limit(LOG_ARCHIVE_CHUNK_LINES).execute().data or []
+        if not rows:
+            break
+
+        supabase.table('job_log_chunks').upsert({
+            'job_id': job_id,
+            'chunk': chunk,
+            'first_seq': rows[0]['seq'],
+            'last_seq': rows[-1]['seq'],
+            'line_count': len(rows),
+            'encoding': 'gzip',
+            'data': _encode(rows)
+        }, on_conflict='job_id,chunk').execute()
+        chunk, after = chunk + 1, rows[-1]['seq']
+
+    supabase.table('jobs').update({'logs_archived_at': datetime.utcnow().isoformat()}).eq('id', job_id).execute()
+    supabase.table('job_logs').delete().eq('job_id', job_id).execute()
+
+def read_archived(job_id, after=None, limit=1000, tail=None):
+    """Read archived lines with the same semantics as log_store.fetch_logs"""
+    # Chunks hold LOG_ARCHIVE_CHUNK_LINES lines, so this many always covers the range
+    wanted = tail or limit
+    chunk_count = wanted // LOG_ARCHIVE_CHUNK_LINES + 2
+    query = supabase.table('job_log_chunks')\
+        .select('chunk, first_seq, last_seq, encoding, data')\
+        .eq('job_id', job_id)
+
+    if tail:
+        chunks = query.order('chunk', desc=True).limit(chunk_count).execute().data or []
+        lines = [line for c in reversed(chunks) for line in _decode(c, job_id)]
+        return lines[-tail:]
+
+    if after is not None:
+        query = query.gt('last_seq', after)
+    chunks = query.order('chunk', desc=False).limit(chunk_count).execute().data or []
+    lines = [line for c in chunks for line in _decode(c, job_id)
+             if after is None or line['seq'] > after]
+    return lines[:limit]
+
+def _encode(rows):
+    text = '\n'.join(json.dumps([row[f] for f in FIELDS]) for row in rows)
+    return base64.b64encode(gzip.compress(text.encode('utf-8'))).decode('ascii')
+
+def _decode(chunk, job_id):
+    if chunk.get('encoding', 'gzip') != 'gzip':
+        raise ValueError(f"Unsupported log chunk encoding: {chunk['encoding']}")
+    text = gzip.decompress(base64.b64decode(chunk['data'])).decode('utf-8')
+    return [{'job_id': job_id, **dict(zip(FIELDS, json.loads(line)))} for line in text.split('\n') if line]
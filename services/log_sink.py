@@ -0,0 +1,182 @@
+import time
+import logging
+import threading
+from datetime import datetime
+from config import LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_BUFFER_LIMIT, LOG_FLUSH_RETRIES
+from services import metrics, job_store
+
+# Child of Flask's app logger, so failures land wherever the app's logs go
+logger = logging.getLogger('app').getChild('log_sink')
+
+# Open sinks by job id
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+# Bumped after every write so local log streams can wake up without polling
+_versions = {}
+_written = threading.Condition()
+
+class JobLogSink:
+    """Buffer log lines for one job and write them to job_logs in bulk"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._rows = []
+        self._retry = []  # Lines whose write failed, given one more round before they are dropped
+        self._inflight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, message, level='info', step=None):
+        """Queue a line, blocking while the buffer is full"""
+        row = {
+            'job_id': self.job_id,
+            'message': message,
+            'level': level,
+            'step': step,
+            # Set client-side so lines of one batch keep their order
+            'created_at': datetime.utcnow().isoformat()
+        }
+        with self._cond:
+            while len(self._rows) + len(self._retry) + self._inflight >= LOG_BUFFER_LIMIT and not self._closed:
+                self._cond.wait()
+            self._rows.append(row)
+            if len(self._rows) >= LOG_BATCH_SIZE:
+                self._cond.notify_all()
+
+    def flush(self):
+        """Block until every queued line has been written"""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while (self._rows or self._retry or self._inflight) and self._thread.is_alive():
+                self._cond.wait(LOG_FLUSH_INTERVAL)
+
+    def close(self):
+        """Write remaining lines and stop the flusher thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+                while not (self._closed or self._flush_requested) and len(self._rows) < LOG_BATCH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch, self._rows = self._rows, []
+                retry, self._retry = self._retry, []
+                self._inflight = len(batch) + len(retry)
+                self._flush_requested = False
+                closing = self._closed
+
+            # Older lines first, so a retried batch keeps its place in the log
+            lost = self._insert_all(retry)
+            if lost:
+                metrics.LOG_LINES_DROPPED.inc(len(lost))
+                logger.error("Dropped %d log lines for job %s after every write retry failed",
+                             len(lost), self.job_id)
+            failed = self._insert_all(batch)
+            if batch or retry:
+                _notify_written(self.job_id)
+
+            with self._cond:
+                self._retry = failed
+                self._inflight = 0
+                self._cond.notify_all()
+                # Closing still gets one more round for lines that just failed
+                if closing and not self._rows and not self._retry:
+                    return
+
+    def _insert_all(self, rows):
+        """Write rows in batches; returns the rows that could not be written"""
+        failed = []
+        for i in range(0, len(rows), LOG_BATCH_SIZE):
+            if not self._insert(rows[i:i + LOG_BATCH_SIZE]):
+                failed.extend(rows[i:i + LOG_BATCH_SIZE])
+        return failed
+
+    def _insert(self, rows):
+        for attempt in range(LOG_FLUSH_RETRIES):
+            try:
+                job_store.write_logs(self.job_id, rows)
+                metrics.LOG_LINES.inc(len(rows))
+                return True
+            except Exception as e:
+                if attempt == LOG_FLUSH_RETRIES - 1:
+                    logger.warning("Failed to write %d log lines for job %s: %s", len(rows), self.job_id, e)
+                else:
+                    time.sleep(0.5 * 2 ** attempt)
+        return False
+
+def open_sink(job_id):
+    """Start buffering logs for a job"""
+    with _sinks_lock:
+        sink = _sinks.get(job_id)
+        if sink is None:
+            sink = _sinks[job_id] = JobLogSink(job_id)
+        return sink
+
+def close_sink(job_id):
+    """Flush and close the sink for a job"""
+    with _sinks_lock:
+        sink = _sinks.pop(job_id, None)
+    if sink:
+        sink.close()
+    with _written:
+        _versions.pop(job_id, None)
+
+def flush(job_id):
+    """Flush buffered logs for a job, if it has a sink"""
+    sink = _sinks.get(job_id)
+    if sink:
+        sink.flush()
+
+def write(job_id, message, level='info', step=None):
+    """Write a log line through the job's sink, or directly if it has none"""
+    sink = _sinks.get(job_id)
+    if sink:
+        sink.write(message, level, step)
+        return
+
+    job_store.write_logs(job_id, [{
+        'job_id': job_id,
+        'message': message,
+        'level': level,
+        'step': step
+    }])
+    metrics.LOG_LINES.inc()
+    _notify_written(job_id)
+
+def append(job_id, rows):
+    """Write a batch a remote runner already buffered, and wake local log streams"""
+    job_store.write_logs(job_id, rows)
+    metrics.LOG_LINES.inc(len(rows))
+    _notify_written(job_id)
+
+def written_version(job_id):
+    """Counter that changes whenever this process writes lines for a job"""
+    with _written:
+        return _versions.get(job_id, 0)
+
+def wait_for_lines(job_id, version, timeout):
+    """Wait until this process writes lines for a job after `version`, or timeout.
+
+    Lines written by other processes are not signalled, so callers must
+    still re-check the database when this times out.
+    """
+    with _written:
+        return _written.wait_for(lambda: _versions.get(job_id, 0) != version, timeout)
+
+def _notify_written(job_id):
+    with _written:
+        _versions[job_id] = _versions.get(job_id, 0) + 1
+        _written.notify_all()
@@ -0,0 +1,25 @@
+from config import supabase
+from services.log_archive import read_archived
+
+def fetch_logs(job_id, after=None, limit=1000, tail=None, archived=False):
+    """Read a job's log lines in seq order.
+
+    Returns lines with seq > after, at most `limit` of them; with `tail`,
+    returns the last `tail` lines instead (still oldest first). Lines of
+    archived jobs are read from their compressed chunks.
+    """
+    if archived:
+        return read_archived(job_id, after=after, limit=limit, tail=tail)
+
+    query = supabase.table('job_logs')\
+        .select('*')\
+        .eq('job_id', job_id)
+
+    if tail:
+        result = query.order('seq', desc=True).limit(tail).execute()
+        return list(reversed(result.data or []))
+
+    if after is not None:
+        query = query.gt('seq', after)
+    result = query.order('seq', desc=False).limit(limit).execute()
+    return result.data or []
@@ -0,0 +1,74 @@
+import json
+import time
+import threading
+from config import (
+    supabase, LOG_STREAM_POLL_INTERVAL, LOG_STREAM_KEEPALIVE, LOG_STREAM_MAX_SECONDS, LOG_STREAM_MAX_CONCURRENT
+)
+from services import log_sink
+from services.log_store import fetch_logs
+
+TERMINAL_STATUSES = ['success', 'failed', 'cancelled']
+PAGE_SIZE = 500
+
+# Streams open in this process; each one holds a gunicorn thread for its whole life
+_slots = threading.BoundedSemaphore(LOG_STREAM_MAX_CONCURRENT)
+
+def acquire_slot():
+    """Reserve a stream slot without waiting; pair a True result with release_slot()"""
+    return _slots.acquire(blocking=False)
+
+def release_slot():
+    _slots.release()
+
+def log_events(job_id, cursor=None):
+    """Yield server-sent events for a job's log lines with seq after `cursor`.
+
+    Each line is a `log` event whose id is its seq, the cursor to resume from. The
+    stream ends with an `end` event once the job has finished and every
+    line has been sent, or silently after LOG_STREAM_MAX_SECONDS so the
+    client reconnects with Last-Event-ID.
+    """
+    started = last_sent = time.monotonic()
+    status, archived = _job_state(job_id)
+    finished = False
+
+    while True:
+        version = log_sink.written_version(job_id)
+        rows = fetch_logs(job_id, after=cursor, limit=PAGE_SIZE, archived=archived)
+        for row in rows:
+            cursor = row['seq']
+            yield _event('log', row, cursor)
+
+        now = time.monotonic()
+        if rows:
+            last_sent = now
+            if len(rows) == PAGE_SIZE:
+                continue
+        else:
+            # Give lines written just after the final status one more poll
+            if finished:
+                yield _event('end', {'status': status})
+                return
+            status, archived = _job_state(job_id)
+            finished = status is None or status in TERMINAL_STATUSES
+
+        if now - started > LOG_STREAM_MAX_SECONDS:
+            return
+        if now - last_sent > LOG_STREAM_KEEPALIVE:
+            yield ': keepalive\n\n'
+            last_sent = now
+
+        log_sink.wait_for_lines(job_id, version, LOG_STREAM_POLL_INTERVAL)
+
+def _job_state(job_id):
+    result = supabase.table('jobs').select('status, logs_archived_at').eq('id', job_id).execute()
+    if not result.data:
+        return None, False
+    return result.data[0]['status'], bool(result.data[0]['logs_archived_at'])
+
+def _event(name, data, event_id=None):
+    lines = [f'event: {name}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,80 @@
+import os
+import time
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+)
+
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR makes every worker write to shared files,
+# so a scrape of any worker sees totals for the whole server
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+JOBS_FINISHED = Counter('ci_jobs_finished_total', 'Jobs that reached a final status', ['status'])
+QUEUE_DEPTH = Gauge('ci_queue_depth', 'Jobs waiting for a runner', multiprocess_mode='mostrecent')
+RUNNING_JOBS = Gauge('ci_running_jobs', 'Jobs executing on this server', multiprocess_mode='livesum')
+STAGE_SECONDS = Histogram('ci_job_stage_duration_seconds', 'Time spent in each job stage',
+                          ['kind'], buckets=DURATION_BUCKETS)
+LOG_LINES = Counter('ci_log_lines_total', 'Log lines written to job_logs')
+LOG_LINES_DROPPED = Counter('ci_log_lines_dropped_total', 'Log lines given up on after every write retry failed')
+DB_SECONDS = Histogram('ci_db_request_duration_seconds', 'Database call latency',
+                       ['table', 'operation'])
+HTTP_SECONDS = Histogram('ci_http_request_duration_seconds', 'HTTP request latency',
+                         ['method', 'route', 'status'])
+
+OPERATIONS = {'GET': 'select', 'HEAD': 'count', 'POST': 'insert', 'PATCH': 'update', 'DELETE': 'delete'}
+
+def render():
+    """Body and content type for a /metrics response"""
+    registry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def instrument_db(client):
+    """Time every query made through the storage client, whichever backend it is"""
+    if hasattr(client, 'observers'):
+        client.observers.append(lambda table, operation, seconds: DB_SECONDS.labels(table, operation).observe(seconds))
+        return
+    # Supabase: hook the PostgREST HTTP session
+    session = client.postgrest.session
+    hooks = session.event_hooks
+    hooks['request'].append(_on_request)
+    hooks['response'].append(_on_response)
+    session.event_hooks = hooks
+
+def instrument_flask(app):
+    """Time every request by its route pattern (not the raw path, to keep label counts small)"""
+    from flask import request, g
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_SECONDS.labels(request.method, route, str(response.status_code))\
+                .observe(time.perf_counter() - started)
+        return response
+
+def _on_request(request):
+    # Kept on the request itself, so it goes away with it (httpx ignores unknown extensions)
+    request.extensions['ci_metrics_started'] = time.perf_counter()
+
+def _on_response(response):
+    started = response.request.extensions.get('ci_metrics_started')
+    if started is None:
+        return
+    # /rest/v1/<table> or /rest/v1/rpc/<function>
+    parts = response.request.url.path.rstrip('/').split('/')
+    if len(parts) >= 2 and parts[-2] == 'rpc':
+        table, operation = parts[-1], 'rpc'
+    else:
+        table, operation = parts[-1], OPERATIONS.get(response.request.method, response.request.method.lower())
+        if operation == 'insert' and 'resolution=' in response.request.headers.get('prefer', ''):
+            operation = 'upsert'
+    DB_SECONDS.labels(table, operation).observe(time.perf_counter() - started)
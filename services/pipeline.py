@@ -0,0 +1,116 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+def parse_steps(ci_config):
+    """Build the step list from ci.json.
+
+    A plain "commands" list becomes a single unnamed step. "steps" entries
+    are either a command string or {"name", "run" | "commands", "needs"}.
+    Raises ValueError for malformed or unknown needs, duplicate names or cycles.
+    """
+    if 'steps' not in ci_config:
+        return [{'name': None, 'commands': list(ci_config.get('commands', [])), 'needs': []}]
+
+    steps = []
+    for i, raw in enumerate(ci_config['steps']):
+        if isinstance(raw, str):
+            raw = {'run': raw}
+        commands = raw.get('commands') or ([raw['run']] if raw.get('run') else [])
+        name = str(raw.get('name') or f'step-{i + 1}')
+        needs = raw.get('needs') or []
+        if isinstance(needs, str):
+            needs = [needs]
+        if not isinstance(needs, list) or not all(isinstance(n, str) for n in needs):
+            raise ValueError(f"Step {name}: needs must be a step name or a list of step names")
+        steps.append({
+            'name': name,
+            'commands': [commands] if isinstance(commands, str) else list(commands),
+            'needs': needs
+        })
+
+    names = [step['name'] for step in steps]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate step names: {', '.join(sorted(duplicates))}")
+    for step in steps:
+        unknown = [n for n in step['needs'] if n not in names]
+        if unknown:
+            raise ValueError(f"Step {step['name']} needs unknown step(s): {', '.join(unknown)}")
+
+    # Kahn's algorithm: anything left over is part of a cycle
+    remaining = {step['name']: set(step['needs']) for step in steps}
+    while True:
+        ready = [name for name, needs in remaining.items() if not needs]
+        if not ready:
+            break
+        for name in ready:
+            del remaining[name]
+        for needs in remaining.values():
+            needs.difference_update(ready)
+    if remaining:
+        raise ValueError(f"Steps have a dependency cycle: {', '.join(sorted(remaining))}")
+
+    return steps
+
+def run_steps(steps, run_step, max_parallel=1, fail_fast=True, on_abort=None, should_stop=None):
+    """Run steps as a DAG, at most max_parallel at a time.
+
+    run_step(step, abort) returns True on success; abort is an Event set on a
+    fail-fast abort, for steps to check between commands. Steps whose needs
+    did not all succeed are skipped. With fail_fast, the first failure stops
+    new steps from starting, sets abort and calls on_abort() so running ones
+    can be killed; those are reported as cancelled. Returns {step name: outcome}.
+    """
+    max_parallel = max(1, max_parallel)
+    pending = {step['name']: step for step in steps}
+    results = {}
+    futures = {}
+    aborted = False
+    abort = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        while pending or futures:
+            if aborted or (should_stop and should_stop()):
+                for name in pending:
+                    results[name] = 'skipped'
+                pending.clear()
+
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, step in list(pending.items()):
+                    needs = [results.get(n) for n in step['needs']]
+                    if any(outcome not in (None, 'success') for outcome in needs):
+                        results[name] = 'skipped'
+                    elif all(outcome == 'success' for outcome in needs) and len(futures) < max_parallel:
+                        futures[pool.submit(run_step, step, abort)] = name
+                    else:
+                        continue
+                    del pending[name]
+                    progressed = True
+
+            if not futures:
+                continue
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures.pop(future)
+                try:
+                    ok = future.result()
+                except Exception:
+                    ok = False
+
+                if ok:
+                    results[name] = 'success'
+                elif aborted:
+                    results[name] = 'cancelled'
+                else:
+                    results[name] = 'failed'
+                    if fail_fast:
+                        aborted = True
+                        # Set before killing, so a command started after the kill sees it
+                        abort.set()
+                        if on_abort:
+                            on_abort()
+
+    return results
@@ -0,0 +1,61 @@
+import os
+import shlex
+from config import JOB_DEFAULT_CPUS, JOB_DEFAULT_MEMORY_MB, JOB_CGROUP_ROOT
+
+def budget(job):
+    """(cpus, memory_mb) a job asked for, or the defaults"""
+    return float(job.get('cpus') or JOB_DEFAULT_CPUS), int(job.get('memory_mb') or JOB_DEFAULT_MEMORY_MB)
+
+def parallelism_env(cpus):
+    """Size build tools' worker pools to the job's CPUs instead of the whole host"""
+    n = str(max(1, int(cpus)))
+    return {
+        'CI_CPUS': n,
+        'MAKEFLAGS': f'-j{n}',
+        'CMAKE_BUILD_PARALLEL_LEVEL': n,
+        'CARGO_BUILD_JOBS': n,
+        'GOMAXPROCS': n,
+        'PYTEST_XDIST_AUTO_NUM_WORKERS': n,
+        'GRADLE_OPTS': f"{os.getenv('GRADLE_OPTS', '')} -Dorg.gradle.workers.max={n}".strip()
+    }
+
+def create_cgroup(job_id, cpus, memory_mb):
+    """Create a cgroup v2 group for a job under JOB_CGROUP_ROOT; returns its path or None"""
+    if not JOB_CGROUP_ROOT or os.name == 'nt':
+        return None
+    path = os.path.join(JOB_CGROUP_ROOT, f'job-{job_id}')
+    try:
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'cpu.max'), 'w') as f:
+            f.write(f'{int(cpus * 100000)} 100000')
+        with open(os.path.join(path, 'memory.max'), 'w') as f:
+            f.write(str(memory_mb * 1024 ** 2))
+        return path
+    except OSError as e:
+        print(f"Could not create cgroup for job {job_id}: {e}")
+        remove_cgroup(path)
+        return None
+
+def remove_cgroup(path):
+    """Remove a job's cgroup once its processes have exited"""
+    if not path:
+        return
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
+
+def limit_command(command, memory_mb, cgroup=None):
+    """Wrap a shell command so it and its children run inside the job's limits.
+
+    The wrapper shell joins the cgroup (or caps its data segment when there
+    is none) and then execs the real command, so nothing escapes the limit.
+    """
+    if os.name == 'nt':
+        return command
+    if cgroup:
+        setup = f"echo $$ > {shlex.quote(os.path.join(cgroup, 'cgroup.procs'))}"
+    else:
+        # Per process rather than per job, but keeps one runaway from taking the host
+        setup = f'ulimit -d {memory_mb * 1024} 2>/dev/null'
+    return f'{setup}; exec /bin/sh -c {shlex.quote(command)}'
@@ -0,0 +1,76 @@
+import httpx
+from config import RUNNER_LONG_POLL_SECONDS
+
+class RunnerClient:
+    """A runner agent's connection to the server's /api/runners endpoints.
+
+    Implements the remote side of services/job_store, so the job runner
+    leases, logs and reports the same way whether it lives next to the
+    database or on another machine.
+    """
+
+    def __init__(self, server_url, token, timeout=30):
+        self.http = httpx.Client(
+            base_url=server_url.rstrip('/'),
+            headers={'Authorization': f'Bearer {token}'},
+            timeout=timeout
+        )
+        self.runner_id = None
+
+    def register(self, name, labels, cpus, memory_mb):
+        """Announce this agent; leases are held under the id the server assigns"""
+        runner = self._post('', {'name': name, 'labels': labels, 'cpus': cpus, 'memory_mb': memory_mb}).json()
+        self.runner_id = runner['id']
+        return runner
+
+    def lease(self, max_cpus=None, max_memory_mb=None):
+        """Wait up to the long-poll window for a job that fits; None if none came"""
+        response = self._post('/lease', {
+            'max_cpus': max_cpus,
+            'max_memory_mb': max_memory_mb,
+            'wait': RUNNER_LONG_POLL_SECONDS
+        }, timeout=RUNNER_LONG_POLL_SECONDS + 15)
+        return response.json() if response.status_code == 200 else None
+
+    def heartbeat(self):
+        return set(self._post('/heartbeat', {}).json()['job_ids'])
+
+    def write_logs(self, job_id, rows):
+        lines = [{key: row.get(key) for key in ('message', 'level', 'step', 'created_at')} for row in rows]
+        # 409: the job was cancelled or re-leased, so its last lines have nowhere to go
+        self._post(f'/jobs/{job_id}/logs', {'lines': lines}, allow=(409,))
+
+    def save_steps(self, job_id, rows):
+        self._post(f'/jobs/{job_id}/steps', {'steps': rows})
+
+    def report(self, job_id, updates):
+        """Send a job's final status; False if the server says the lease was lost"""
+        if updates['status'] not in ['success', 'failed']:
+            return False
+        response = self._post(f'/jobs/{job_id}/status', {
+            'status': updates['status'],
+            'cached_from': updates.get('cached_from')
+        }, allow=(409,))
+        return response.status_code == 200
+
+    def lookup_build(self, job_id, commit_sha, key):
+        response = self.http.get(self._url(f'/jobs/{job_id}/build-cache'),
+                                 params={'commit_sha': commit_sha, 'config_hash': key})
+        response.raise_for_status()
+        return response.json()['job_id']
+
+    def record_build(self, job_id, commit_sha, key):
+        self._post(f'/jobs/{job_id}/build-cache', {'commit_sha': commit_sha, 'config_hash': key})
+
+    def running_job_ids(self, job_ids):
+        from services.job_runner import running_jobs
+        return set(job_ids) & set(running_jobs)
+
+    def _url(self, path):
+        return f'/api/runners/{self.runner_id}{path}' if self.runner_id else f'/api/runners{path}'
+
+    def _post(self, path, body, timeout=None, allow=()):
+        response = self.http.post(self._url(path), json=body, timeout=timeout or self.http.timeout)
+        if response.status_code not in allow:
+            response.raise_for_status()
+        return response
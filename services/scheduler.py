@@ -0,0 +1,140 @@
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from config import JOB_HEARTBEAT_INTERVAL, JOB_POLL_INTERVAL
+from services import job_queue, job_store, metrics
+
+class JobScheduler:
+    """Fixed-size pool of runner threads that lease jobs from the jobs table"""
+
+    def __init__(self, max_workers, target, on_lost, can_claim=None, capacity=None):
+        self.max_workers = max_workers
+        self._target = target
+        self._on_lost = on_lost
+        self._can_claim = can_claim
+        self._capacity = capacity  # {'cpus', 'memory_mb'} shared by running jobs, or None
+        self._reserved = {}  # job_id -> (cpus, memory_mb)
+        self._claim_lock = threading.Lock()
+        self._running = {}  # job_id -> started_at
+        self._waits = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        """Start the runner threads and the lease heartbeat"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.max_workers):
+                self._spawn(self._work, f'job-runner-{i}')
+            self._spawn(self._heartbeat, 'job-heartbeat')
+
+    def wake(self):
+        """Tell an idle runner that a job was just queued"""
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def stats(self):
+        """Queue depth, slot usage and recent wait times"""
+        try:
+            queued = job_store.pending_count()
+        except Exception:
+            queued = None
+        with self._lock:
+            waits = list(self._waits)
+            return {
+                'worker_id': job_queue.worker_id(),
+                'workers': self.max_workers,
+                'running': len(self._running),
+                'reserved_cpus': sum(cpus for cpus, _ in self._reserved.values()),
+                'reserved_memory_mb': sum(memory for _, memory in self._reserved.values()),
+                'queued': queued,
+                'avg_wait_seconds': round(sum(waits) / len(waits), 2) if waits else 0,
+                'max_wait_seconds': round(max(waits), 2) if waits else 0
+            }
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = None
+            try:
+                # Leave the job for a runner on a host with room for it
+                if not self._can_claim or self._can_claim():
+                    job = self._claim()
+            except Exception as e:
+                print(f"Failed to claim job: {e}")
+
+            if not job:
+                with self._wakeup:
+                    self._wakeup.wait(JOB_POLL_INTERVAL)
+                continue
+
+            job_id = job['id']
+            with self._lock:
+                self._waits.append(_queue_wait(job))
+                self._running[job_id] = time.monotonic()
+            metrics.RUNNING_JOBS.inc()
+            try:
+                self._target(job)
+            except Exception as e:
+                print(f"Runner crashed on job {job_id}: {e}")
+            finally:
+                metrics.RUNNING_JOBS.dec()
+                with self._lock:
+                    self._running.pop(job_id, None)
+                    self._reserved.pop(job_id, None)
+
+    def _claim(self):
+        """Lease a job that fits in the capacity left over by running jobs"""
+        if not self._capacity:
+            return job_store.claim_job()
+
+        # One claim at a time, so two runners can't both take the last free slot
+        with self._claim_lock:
+            free = self._free()
+            if free['cpus'] <= 0 or free['memory_mb'] <= 0:
+                return None
+            job = job_store.claim_job(max_cpus=free['cpus'], max_memory_mb=free['memory_mb'],
+                                      total_cpus=self._capacity['cpus'], total_memory_mb=self._capacity['memory_mb'])
+            if job:
+                with self._lock:
+                    self._reserved[job['id']] = (float(job.get('cpus') or 0), int(job.get('memory_mb') or 0))
+            return job
+
+    def _free(self):
+        with self._lock:
+            reserved = list(self._reserved.values())
+        return {
+            'cpus': self._capacity['cpus'] - sum(cpus for cpus, _ in reserved),
+            'memory_mb': self._capacity['memory_mb'] - sum(memory for _, memory in reserved)
+        }
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            with self._lock:
+                running = set(self._running)
+            if not running:
+                continue
+            try:
+                owned = job_store.renew_leases()
+            except Exception as e:
+                print(f"Failed to renew job leases: {e}")
+                continue
+            # Cancelled, or leased by another runner after we missed heartbeats
+            for job_id in running - owned:
+                self._on_lost(job_id)
+
+def _queue_wait(job):
+    try:
+        created = datetime.fromisoformat(job['created_at'])
+        started = datetime.fromisoformat(job['started_at'])
+        return max(0.0, (started - created).total_seconds())
+    except (KeyError, TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,73 @@
+import time
+import threading
+from datetime import datetime, timezone
+from services import metrics, job_store
+
+# Finished and still-open spans by job id, written to job_steps when the job ends
+_spans = {}
+_open = {}
+_lock = threading.Lock()
+
+def start(job_id, kind, name=None, step=None):
+    """Open a span for one stage of a job (queue, clone, config, deps, command, cleanup)"""
+    span = {
+        'job_id': job_id,
+        'kind': kind,
+        'name': name,
+        'step': step,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        '_t0': time.monotonic()
+    }
+    with _lock:
+        _open.setdefault(job_id, []).append(span)
+    return span
+
+def finish(span, status='success', exit_code=None):
+    """Close a span and keep it until the job's spans are saved"""
+    span.update({
+        'duration_ms': int((time.monotonic() - span.pop('_t0')) * 1000),
+        'status': status,
+        'exit_code': exit_code
+    })
+    metrics.STAGE_SECONDS.labels(span['kind']).observe(span['duration_ms'] / 1000)
+    with _lock:
+        _open.get(span['job_id'], []).remove(span)
+        _spans.setdefault(span['job_id'], []).append(span)
+
+def record_queue_wait(job):
+    """Add a span for the time a job spent between being created and leased"""
+    try:
+        created = datetime.fromisoformat(job['created_at'])
+        started = datetime.fromisoformat(job['started_at'])
+    except (KeyError, TypeError, ValueError):
+        return
+    wait_ms = max(0, int((started - created).total_seconds() * 1000))
+    metrics.STAGE_SECONDS.labels('queue').observe(wait_ms / 1000)
+    with _lock:
+        _spans.setdefault(job['id'], []).append({
+            'job_id': job['id'],
+            'kind': 'queue',
+            'name': None,
+            'step': None,
+            'started_at': job['created_at'],
+            'duration_ms': wait_ms,
+            'status': 'success',
+            'exit_code': None
+        })
+
+def save(job_id, repo_url):
+    """Write a job's spans to job_steps in one insert; spans still open count as failed"""
+    with _lock:
+        unfinished = list(_open.get(job_id, []))
+    for span in unfinished:
+        finish(span, 'failed')
+
+    with _lock:
+        _open.pop(job_id, None)
+        spans = _spans.pop(job_id, [])
+    if not spans:
+        return
+    try:
+        job_store.save_steps(job_id, [{**span, 'repo_url': repo_url} for span in spans])
+    except Exception as e:
+        print(f"Failed to save timings for job {job_id}: {e}")
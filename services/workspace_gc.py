@@ -0,0 +1,174 @@
+import os
+import uuid
+import time
+import queue
+import shutil
+import threading
+from config import (
+    WORKSPACE_DIR, WORKSPACE_MAX_BYTES, WORKSPACE_GC_INTERVAL, WORKSPACE_GC_MIN_AGE,
+    WORKSPACE_POOL_ENABLED, WORKSPACE_POOL_DIR
+)
+from services.disk import dir_size
+from services import job_store
+
+TRASH_DIR = os.path.join(WORKSPACE_DIR, '.trash')
+# Present while over quota, so every process on the host (gunicorn workers, agents) sees it
+OVER_QUOTA_MARKER = os.path.join(WORKSPACE_DIR, '.over-quota')
+
+_doomed = queue.Queue()
+_reaper = None
+_collector = None
+_reaper_lock = threading.Lock()
+
+def discard(path):
+    """Delete a workspace in the background.
+
+    The directory is renamed into the trash first, so the name is free and
+    the job can finish immediately; a crash leaves it in the trash for the
+    next GC pass rather than half-deleted in place.
+    """
+    if not os.path.exists(path):
+        return
+    os.makedirs(TRASH_DIR, exist_ok=True)
+    target = os.path.join(TRASH_DIR, f'{os.path.basename(path)}-{uuid.uuid4().hex[:8]}')
+    try:
+        os.rename(path, target)
+    except FileNotFoundError:
+        return  # Another process moved it first
+    except OSError as e:
+        print(f"Could not move workspace {path} to trash, deleting in place: {e}")
+        target = path
+    _ensure_reaper()
+    _doomed.put(target)
+
+def has_room():
+    """Whether workspaces were under their quota when last measured by any process"""
+    return not os.path.exists(OVER_QUOTA_MARKER)
+
+def start_workspace_gc():
+    """Periodically empty the trash, remove orphaned workspaces and check the quota"""
+    global _collector
+    _ensure_reaper()
+    if _collector:
+        return
+    _collector = threading.Thread(target=_collect_loop, name='workspace-gc', daemon=True)
+    _collector.start()
+
+def collect():
+    """One GC pass; returns bytes used by workspaces afterwards"""
+    if not os.path.isdir(WORKSPACE_DIR):
+        return 0
+
+    # Left behind by a crash or a failed delete
+    if os.path.isdir(TRASH_DIR):
+        for entry in os.scandir(TRASH_DIR):
+            _doomed.put(entry.path)
+
+    # Workspaces are named by job id; any whose job is no longer running is an orphan
+    now = time.time()
+    candidates = {entry.name: entry.path for entry in os.scandir(WORKSPACE_DIR)
+                  if entry.is_dir() and _is_job_id(entry.name)
+                  and now - entry.stat().st_mtime > WORKSPACE_GC_MIN_AGE}
+    if candidates:
+        live = job_store.running_job_ids(list(candidates))
+        for name, path in candidates.items():
+            if name not in live:
+                print(f"Removing orphaned workspace {name}")
+                discard(path)
+
+    _doomed.join()
+    return _check_quota()
+
+def _check_quota():
+    """Measure workspaces (pooled ones included) and pause or resume new jobs accordingly"""
+    used = dir_size(WORKSPACE_DIR) if os.path.isdir(WORKSPACE_DIR) else 0
+    if WORKSPACE_POOL_ENABLED and os.path.isdir(WORKSPACE_POOL_DIR) and not _inside(WORKSPACE_POOL_DIR, WORKSPACE_DIR):
+        used += dir_size(WORKSPACE_POOL_DIR)
+    was_over = not has_room()
+    over = bool(WORKSPACE_MAX_BYTES) and used > WORKSPACE_MAX_BYTES
+    if over and not was_over:
+        os.makedirs(WORKSPACE_DIR, exist_ok=True)
+        open(OVER_QUOTA_MARKER, 'a').close()
+        print(f"Workspaces use {used} bytes, over the {WORKSPACE_MAX_BYTES} byte quota; pausing new jobs")
+    elif was_over and not over:
+        try:
+            os.remove(OVER_QUOTA_MARKER)
+        except FileNotFoundError:
+            pass
+        print(f"Workspaces use {used} bytes, back under the quota; resuming new jobs")
+    return used
+
+def _inside(path, parent):
+    path, parent = os.path.abspath(path), os.path.abspath(parent)
+    return os.path.commonpath([path, parent]) == parent
+
+def _is_job_id(name):
+    try:
+        return str(uuid.UUID(name)) == name
+    except ValueError:
+        return False
+
+def _ensure_reaper():
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_loop, name='workspace-reaper', daemon=True)
+            _reaper.start()
+
+def _reap_loop():
+    while True:
+        path = _doomed.get()
+        try:
+            target = _claim(path)
+            if target:
+                shutil.rmtree(target)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # Stays in the trash (or in place) and is retried on the next GC pass
+            print(f"Failed to delete workspace {path}: {e}")
+        finally:
+            _doomed.task_done()
+        # Deletes are what free space, so don't leave jobs paused until the next GC pass
+        if not has_room() and _doomed.empty():
+            _check_quota()
+
+def _claim(path):
+    """Take path for this reaper alone; None if another process's reaper got it first.
+
+    Every process's GC pass queues the whole trash, so each entry is renamed
+    to a name only this reaper knows before it is deleted.
+    """
+    name = os.path.basename(path)
+    if name.startswith('.reaping-'):
+        pid = int(name.split('-')[1])
+        if pid == os.getpid():
+            return path  # Ours already, from a delete that failed part way
+        if _alive(pid):
+            return None  # Still being deleted by its owner
+    target = os.path.join(TRASH_DIR, f'.reaping-{os.getpid()}-{uuid.uuid4().hex[:8]}')
+    try:
+        os.rename(path, target)
+    except FileNotFoundError:
+        return None
+    except OSError:
+        # Couldn't move it (e.g. a workspace deleted in place); delete where it is
+        return path
+    return target
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Exists but owned by someone else
+    return True
+
+def _collect_loop():
+    while True:
+        try:
+            collect()
+        except Exception as e:
+            print(f"Workspace GC failed: {e}")
+        time.sleep(WORKSPACE_GC_INTERVAL)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import hashlib
+from contextlib import ExitStack
+from config import WORKSPACE_POOL_DIR, WORKSPACE_POOL_SIZE, WORKSPACE_POOL_PRESERVE
+from services.git_service import clone_repo, sync_workspace
+from services.disk import path_lock
+
+def acquire(repo_url, branch):
+    """Lease a warm workspace for repo_url/branch.
+
+    Returns a lease dict with 'path', or None when every slot is busy, in
+    which case the job should use a throwaway checkout.
+    """
+    name = repo_url.rstrip('/').split('/')[-1].removesuffix('.git') or 'repo'
+    digest = hashlib.sha256(f'{repo_url}#{branch}'.encode('utf-8')).hexdigest()[:16]
+    prefix = f'{name}-{digest}-'
+
+    existing = [e.name for e in _entries() if e.name.startswith(prefix)]
+    # Prefer slots that already hold a checkout, then a fresh one
+    candidates = sorted(existing) + [f'{prefix}{i}' for i in range(WORKSPACE_POOL_SIZE) if f'{prefix}{i}' not in existing]
+    for slot in candidates:
+        lease = _lock(os.path.join(WORKSPACE_POOL_DIR, slot))
+        if not lease:
+            continue
+        if _evict(keep=lease['path']) or slot in existing:
+            return lease
+        # Every other workspace is busy; don't grow past the capacity
+        release(lease, keep=False)
+        return None
+    return None
+
+def prepare(lease, repo_url, branch):
+    """Reset a leased workspace to the branch tip, cloning it if it is new or broken"""
+    path = lease['path']
+    if os.path.isdir(os.path.join(path, '.git')):
+        try:
+            sync_workspace(repo_url, branch, path, WORKSPACE_POOL_PRESERVE)
+            lease['warm'] = True
+            return
+        except Exception as e:
+            print(f"Could not reuse workspace {path}, recloning: {e}")
+
+    shutil.rmtree(path, ignore_errors=True)
+    clone_repo(repo_url, branch, path)
+    lease['warm'] = False
+
+def release(lease, keep=True):
+    """Return a workspace to the pool, or discard it if keep is False"""
+    if not keep:
+        shutil.rmtree(lease['path'], ignore_errors=True)
+    elif os.path.isdir(lease['path']):
+        os.utime(lease['path'])  # Eviction goes by last use
+    lease['stack'].close()
+
+def _lock(path):
+    stack = ExitStack()
+    if not stack.enter_context(path_lock(path, blocking=False)):
+        stack.close()
+        return None
+    # Create it right away so other processes count it against the capacity
+    os.makedirs(path, exist_ok=True)
+    return {'path': path, 'stack': stack, 'warm': False}
+
+def _entries():
+    if not os.path.isdir(WORKSPACE_POOL_DIR):
+        return []
+    return [e for e in os.scandir(WORKSPACE_POOL_DIR) if e.is_dir()]
+
+def _evict(keep):
+    """Remove least recently used idle workspaces to make room for keep; returns whether it fits"""
+    entries = sorted((e.stat().st_mtime, e.path) for e in _entries() if e.path != keep)
+    excess = len(entries) + 1 - WORKSPACE_POOL_SIZE
+    for _, path in entries:
+        if excess <= 0:
+            break
+        with path_lock(path, blocking=False) as acquired:
+            if not acquired:
+                continue  # In use by another job
+            shutil.rmtree(path, ignore_errors=True)
+            excess -= 1
+    return excess <= 0
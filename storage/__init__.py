@@ -0,0 +1,84 @@
+"""Database clients with the Supabase query builder interface.
+
+Every backend answers the same `.table(...).select/insert/update/upsert/delete`,
+filter and `.rpc(...)` calls the app already makes, so callers don't change
+when STORAGE_BACKEND does.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+BACKENDS = ('supabase', 'postgres', 'sqlite', 'none')
+
+_executor = None
+_workers = 10
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+def connect(backend, supabase_url=None, supabase_key=None, database_url=None,
+            sqlite_path=None, pool_min=1, pool_max=10, keepalive_seconds=60, concurrency=10):
+    """Open a client for the chosen backend"""
+    global _workers
+    _workers = concurrency
+    if backend == 'supabase':
+        from supabase import create_client
+        client = create_client(supabase_url, supabase_key)
+        _tune_http_pool(client, pool_max, keepalive_seconds)
+        return client
+    if backend == 'postgres':
+        if not database_url:
+            raise ValueError('STORAGE_BACKEND=postgres needs DATABASE_URL')
+        from storage.postgres import PostgresClient
+        return PostgresClient(database_url, pool_min, pool_max)
+    if backend == 'sqlite':
+        from storage.sqlite import SqliteClient
+        return SqliteClient(sqlite_path)
+    if backend == 'none':
+        # Runner agents: everything goes through the server's HTTP API
+        return None
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+def concurrent(*calls):
+    """Run independent zero-argument calls at once and return their results in order.
+
+    Each query is a network round-trip, so a handler that needs several
+    unrelated results waits for the slowest rather than for their sum. The
+    first exception is re-raised once every call has finished. Calls run
+    outside the Flask request context, so read `g` and `request` first.
+    Calls made from inside another concurrent() run inline, so nesting
+    can't exhaust the pool and deadlock.
+    """
+    if len(calls) < 2 or getattr(_local, 'in_pool', False):
+        return [call() for call in calls]
+    futures = [_pool().submit(_in_pool, call) for call in calls]
+    wait(futures)
+    return [future.result() for future in futures]
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix='db')
+        return _executor
+
+def _in_pool(call):
+    _local.in_pool = True
+    return call()
+
+def _tune_http_pool(client, pool_max, keepalive_seconds):
+    """Give the PostgREST session a keep-alive pool sized for concurrent calls.
+
+    httpx drops idle connections after 5 seconds by default, so a quiet
+    server pays a new TLS handshake on almost every request.
+    """
+    import httpx
+
+    old = client.postgrest.session
+    client.postgrest.session = httpx.Client(
+        base_url=old.base_url,
+        headers=old.headers,
+        timeout=old.timeout,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=pool_max, max_keepalive_connections=pool_max,
+                            keepalive_expiry=keepalive_seconds)
+    )
+    old.close()
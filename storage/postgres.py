@@ -0,0 +1,54 @@
+from datetime import datetime, date
+from decimal import Decimal
+from uuid import UUID
+from psycopg.rows import dict_row
+from psycopg.types.json import Jsonb
+from psycopg_pool import ConnectionPool
+from storage.sql import SqlClient
+
+class PostgresClient(SqlClient):
+    """Direct Postgres access over a pool of connections.
+
+    psycopg prepares a statement server-side once it has run a few times on a
+    connection, so the hot queries (leases, log inserts, job lookups) skip
+    parsing and planning after warm-up.
+    """
+    placeholder = '%s'
+
+    def __init__(self, url, pool_min=1, pool_max=10):
+        super().__init__()
+        self.pool = ConnectionPool(url, min_size=pool_min, max_size=pool_max, open=True,
+                                   kwargs={'autocommit': True, 'row_factory': dict_row},
+                                   name='ci-server')
+
+    def run(self, sql, params):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def call(self, name, params):
+        args = ', '.join(f'{key} => %s' for key in params)
+        rows = self.run(f'select * from {name}({args})', [self.encode(name, k, v) for k, v in params.items()])
+        # Void functions come back as a single row holding null, PostgREST returns nothing
+        if rows == [{name: None}]:
+            return []
+        return [self.decode(name, row) for row in rows]
+
+    def encode(self, table, column, value):
+        if isinstance(value, dict):
+            return Jsonb(value)
+        return value
+
+    def decode(self, table, row):
+        """Convert driver types to the JSON values PostgREST would have returned"""
+        return {column: _json_value(value) for column, value in row.items()}
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, list):
+        return [_json_value(item) for item in value]
+    return value
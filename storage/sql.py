@@ -0,0 +1,269 @@
+import re
+import time
+
+IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+COMPARISONS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+class Result:
+    """Same shape as a PostgREST response: rows in data, total in count"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class SqlClient:
+    """Base for the SQL backends: builds queries, backends run them.
+
+    Subclasses set `placeholder` and implement run(sql, params) returning a
+    list of row dicts, call(name, params) for rpc, and optionally
+    encode(table, column, value) / decode(table, row) for type mapping.
+    """
+    placeholder = '?'
+
+    def __init__(self):
+        # Called with (table, operation, seconds) after every query, e.g. for metrics
+        self.observers = []
+
+    def table(self, name):
+        return Query(self, _identifier(name))
+
+    def rpc(self, name, params=None):
+        return Rpc(self, _identifier(name), params or {})
+
+    def encode(self, table, column, value):
+        return value
+
+    def decode(self, table, row):
+        return row
+
+    def observe(self, table, operation, started):
+        elapsed = time.perf_counter() - started
+        for observer in self.observers:
+            observer(table, operation, elapsed)
+
+class Rpc:
+    def __init__(self, client, name, params):
+        self.client, self.name, self.params = client, name, params
+
+    def execute(self):
+        for key in self.params:
+            _identifier(key)
+        started = time.perf_counter()
+        try:
+            return Result(self.client.call(self.name, self.params))
+        finally:
+            self.client.observe(self.name, 'rpc', started)
+
+class Query:
+    """The subset of the postgrest-py builder this project uses, compiled to SQL"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.operation = 'select'
+        self.columns = '*'
+        self.count = None
+        self.head = False
+        self.values = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.filters = []  # (sql, params)
+        self.orders = []
+        self.row_limit = None
+
+    # Operations
+
+    def select(self, columns='*', count=None, head=False):
+        self.operation = 'select'
+        if columns.strip() != '*':
+            columns = ', '.join(_identifier(c.strip()) for c in columns.split(',') if c.strip())
+        self.columns, self.count, self.head = columns, count, head
+        return self
+
+    def insert(self, values):
+        self.operation, self.values = 'insert', values if isinstance(values, list) else [values]
+        return self
+
+    def upsert(self, values, on_conflict='', ignore_duplicates=False):
+        if not on_conflict:
+            raise ValueError('upsert needs on_conflict columns')
+        self.insert(values)
+        self.operation = 'upsert'
+        self.on_conflict = [_identifier(c.strip()) for c in on_conflict.split(',')]
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values):
+        self.operation, self.values = 'update', [values]
+        return self
+
+    def delete(self):
+        self.operation = 'delete'
+        return self
+
+    # Filters
+
+    def eq(self, column, value):
+        return self._compare(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._compare(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._compare(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._compare(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._compare(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._compare(column, 'lte', value)
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self.filters.append(('1 = 0', []))
+            return self
+        marks = ', '.join([self.client.placeholder] * len(values))
+        self.filters.append((f'{_identifier(column)} in ({marks})',
+                             [self.client.encode(self.table_name, column, v) for v in values]))
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(_is(column, value))
+        return self
+
+    def or_(self, expression):
+        """PostgREST logic tree, e.g. 'a.lt.1,and(a.eq.1,b.lt.2)'"""
+        sql, params = self._logic(_split(expression), 'or')
+        self.filters.append((sql, params))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append(f"{_identifier(column)} {'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, count):
+        self.row_limit = int(count)
+        return self
+
+    # Execution
+
+    def execute(self):
+        started = time.perf_counter()
+        try:
+            return self._execute()
+        finally:
+            self.client.observe(self.table_name, self.operation, started)
+
+    def _execute(self):
+        run, decode = self.client.run, self.client.decode
+        where, params = self._where()
+
+        if self.operation == 'select':
+            total = None
+            if self.count:
+                total = run(f'select count(*) as n from {self.table_name}{where}', params)[0]['n']
+            if self.head:
+                return Result([], total)
+            sql = f'select {self.columns} from {self.table_name}{where}'
+            if self.orders:
+                sql += ' order by ' + ', '.join(self.orders)
+            if self.row_limit is not None:
+                sql += f' limit {self.row_limit}'
+            return Result([decode(self.table_name, row) for row in run(sql, params)], total)
+
+        if self.operation in ('insert', 'upsert'):
+            return Result([decode(self.table_name, row) for row in self._insert()])
+
+        if self.operation == 'update':
+            values = self.values[0]
+            assignments = ', '.join(f'{_identifier(c)} = {self.client.placeholder}' for c in values)
+            sql = f'update {self.table_name} set {assignments}{where} returning *'
+            encoded = [self.client.encode(self.table_name, c, v) for c, v in values.items()]
+            return Result([decode(self.table_name, row) for row in run(sql, encoded + params)])
+
+        sql = f'delete from {self.table_name}{where} returning *'
+        return Result([decode(self.table_name, row) for row in run(sql, params)])
+
+    def _insert(self):
+        if not self.values:
+            return []
+        columns = [_identifier(c) for c in self.values[0]]
+        row_marks = '(' + ', '.join([self.client.placeholder] * len(columns)) + ')'
+        sql = f"insert into {self.table_name} ({', '.join(columns)}) values " + \
+              ', '.join([row_marks] * len(self.values))
+        params = [self.client.encode(self.table_name, c, row.get(c)) for row in self.values for c in columns]
+
+        if self.operation == 'upsert':
+            sql += f" on conflict ({', '.join(self.on_conflict)}) "
+            updates = [c for c in columns if c not in self.on_conflict]
+            if self.ignore_duplicates or not updates:
+                sql += 'do nothing'
+            else:
+                sql += 'do update set ' + ', '.join(f'{c} = excluded.{c}' for c in updates)
+        return self.client.run(sql + ' returning *', params)
+
+    def _where(self):
+        if not self.filters:
+            return '', []
+        return ' where ' + ' and '.join(f'({sql})' for sql, _ in self.filters), \
+               [p for _, params in self.filters for p in params]
+
+    def _compare(self, column, op, value):
+        self.filters.append((f'{_identifier(column)} {COMPARISONS[op]} {self.client.placeholder}',
+                             [self.client.encode(self.table_name, column, value)]))
+        return self
+
+    def _logic(self, terms, joiner):
+        parts, params = [], []
+        for term in terms:
+            group = re.match(r'^(and|or)\((.*)\)$', term, re.S)
+            if group:
+                sql, sub = self._logic(_split(group.group(2)), group.group(1))
+            else:
+                column, op, value = term.split('.', 2)
+                if len(value) >= 2 and value[0] == value[-1] == '"':
+                    value = value[1:-1]
+                if op == 'is':
+                    sql, sub = _is(column, value)
+                elif op in COMPARISONS:
+                    sql = f'{_identifier(column)} {COMPARISONS[op]} {self.client.placeholder}'
+                    sub = [self.client.encode(self.table_name, column, value)]
+                else:
+                    raise ValueError(f'Unsupported operator in filter: {op}')
+            parts.append(f'({sql})')
+            params += sub
+        return f' {joiner} '.join(parts), params
+
+def _identifier(name):
+    if not IDENTIFIER.match(name):
+        raise ValueError(f'Invalid identifier: {name!r}')
+    return name
+
+def _is(column, value):
+    keyword = {'null': 'null', 'none': 'null', 'true': 'true', 'false': 'false'}.get(str(value).lower())
+    if not keyword:
+        raise ValueError(f'Unsupported is value: {value!r}')
+    return f'{_identifier(column)} is {keyword}', []
+
+def _split(expression):
+    """Split on commas that are outside parentheses and double quotes"""
+    terms, depth, quoted, current = [], 0, False, ''
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            terms.append(current.strip())
+            current = ''
+            continue
+        current += char
+    if current.strip():
+        terms.append(current.strip())
+    return terms
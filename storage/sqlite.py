@@ -0,0 +1,236 @@
+import json
+import uuid
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime, date, timezone, timedelta
+from storage.sql import SqlClient
+
+SCHEMA_PATH = Path(__file__).parent.parent / 'schema_sqlite.sql'
+
+class SqliteClient(SqlClient):
+    """Embedded single-file database for local runs and offline benchmarks.
+
+    One connection is shared by every thread and guarded by a lock; SQLite
+    serialises writers anyway, and WAL mode keeps readers from blocking.
+    Values are stored and returned in the same shapes PostgREST uses
+    (ISO timestamps, uuid strings, booleans, JSON arrays).
+    """
+    placeholder = '?'
+
+    def __init__(self, path):
+        super().__init__()
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('pragma journal_mode = wal')
+        self.conn.execute('pragma synchronous = normal')
+        self.conn.execute('pragma foreign_keys = on')
+        # Used by the jobs_retract_rollup trigger
+        self.conn.create_function('job_duration', 2, _duration, deterministic=True)
+        self.conn.create_function('retract_duration_hist', 3, _retract_hist, deterministic=True)
+        self.conn.executescript(SCHEMA_PATH.read_text())
+        self.types = {}
+        for (table,) in self.conn.execute("select name from sqlite_master where type = 'table'").fetchall():
+            info = self.conn.execute(f'pragma table_info({table})').fetchall()
+            self.types[table] = {row['name']: (row['type'].lower(), row['pk']) for row in info}
+
+    def run(self, sql, params):
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def table(self, name):
+        query = super().table(name)
+        if name in self.types:
+            query.insert = _with_defaults(query.insert, self.types[name])
+        return query
+
+    def call(self, name, params):
+        function = FUNCTIONS.get(name)
+        if not function:
+            raise ValueError(f'Unknown function: {name}')
+        with self.lock:
+            self.conn.execute('begin immediate')
+            try:
+                rows = function(self, **params)
+                self.conn.execute('commit')
+            except BaseException:
+                self.conn.execute('rollback')
+                raise
+        return [self.decode('jobs', row) for row in rows or []]
+
+    def encode(self, table, column, value):
+        kind = self.types.get(table, {}).get(column, ('', 0))[0]
+        if value is None:
+            return None
+        if kind == 'timestamptz':
+            return _timestamp(value)
+        if kind == 'boolean':
+            return 1 if value in (True, 'true') else 0
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return value
+
+    def decode(self, table, row):
+        types = self.types.get(table, {})
+        for column, value in row.items():
+            kind = types.get(column, ('', 0))[0]
+            if value is None:
+                continue
+            if kind == 'boolean':
+                row[column] = bool(value)
+            elif kind == 'json':
+                row[column] = json.loads(value)
+        return row
+
+def _with_defaults(insert, types):
+    """Generate uuid keys and created_at in Python, as gen_random_uuid() and now() do in Postgres"""
+    generated = [column for column, (kind, pk) in types.items() if kind == 'uuid' and (pk or column == 'id')]
+
+    def wrapped(values):
+        rows = [dict(row) for row in (values if isinstance(values, list) else [values])]
+        for row in rows:
+            for column in generated:
+                if not row.get(column):
+                    row[column] = str(uuid.uuid4())
+            if 'created_at' in types and not row.get('created_at'):
+                row['created_at'] = _now()
+        return insert(rows)
+    return wrapped
+
+def _now():
+    return _timestamp(datetime.now(timezone.utc))
+
+def _timestamp(value):
+    """Canonical UTC text form, so timestamps sort and compare correctly as strings"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+
+# The plpgsql functions from schema.sql; each runs inside one immediate transaction
+
+def claim_job(db, p_worker, p_lease_seconds, p_max_attempts=3, p_max_cpus=None, p_max_memory_mb=None,
+              p_labels=None, p_total_cpus=None, p_total_memory_mb=None, p_starve_seconds=None):
+    now = _now()
+    abandoned = db.run("""
+        update jobs set status = 'failed', finished_at = ?, lease_owner = null, lease_expires_at = null
+         where status = 'running' and lease_expires_at < ? and attempts >= ?
+        returning id""", [now, now, p_max_attempts])
+    for row in abandoned:
+        record_job_rollup(db, row['id'])
+
+    labels = None if p_labels is None else json.dumps(p_labels)
+    if p_starve_seconds is not None:
+        starved = _timestamp(datetime.now(timezone.utc) - timedelta(seconds=p_starve_seconds))
+        head = db.run("""
+            select cpus, memory_mb from jobs
+             where status = 'pending' and (not_before is null or not_before <= ?) and created_at < ?
+               and (? is null or cpus <= ?)
+               and (? is null or memory_mb <= ?)
+               and (? is null or not exists (select 1 from json_each(jobs.labels)
+                                              where value not in (select value from json_each(?))))
+             order by created_at
+             limit 1""", [now, starved, p_total_cpus, p_total_cpus, p_total_memory_mb, p_total_memory_mb,
+                          labels, labels])
+        if head and ((p_max_cpus is not None and head[0]['cpus'] > p_max_cpus)
+                     or (p_max_memory_mb is not None and head[0]['memory_mb'] > p_max_memory_mb)):
+            return []
+
+    expires = _timestamp(datetime.now(timezone.utc) + timedelta(seconds=p_lease_seconds))
+    return db.run("""
+        update jobs
+           set status = 'running', started_at = ?, lease_owner = ?, lease_expires_at = ?,
+               attempts = coalesce(attempts, 0) + 1
+         where id = (
+           select id from jobs
+            where ((status = 'pending' and (not_before is null or not_before <= ?))
+                   or (status = 'running' and lease_expires_at < ?))
+              and (? is null or cpus <= ?)
+              and (? is null or memory_mb <= ?)
+              and (? is null or not exists (select 1 from json_each(jobs.labels)
+                                             where value not in (select value from json_each(?))))
+            order by created_at
+            limit 1)
+        returning *""", [now, p_worker, expires, now, now, p_max_cpus, p_max_cpus, p_max_memory_mb, p_max_memory_mb,
+                         labels, labels])
+
+def renew_job_leases(db, p_worker, p_lease_seconds):
+    expires = _timestamp(datetime.now(timezone.utc) + timedelta(seconds=p_lease_seconds))
+    return db.run("""
+        update jobs set lease_expires_at = ?
+         where lease_owner = ? and status = 'running'
+        returning id""", [expires, p_worker])
+
+def record_job_rollup(db, p_job_id):
+    from services.analytics import DURATION_BUCKETS
+
+    rows = db.run("""
+        update jobs set rolled_up = 1
+         where id = ? and not rolled_up and status in ('success', 'failed', 'cancelled')
+        returning *""", [p_job_id])
+    if not rows:
+        return []
+    job = rows[0]
+
+    duration = _duration(job['started_at'], job['finished_at'])
+    hist = [0] * len(DURATION_BUCKETS)
+    if duration is not None:
+        hist[_bucket(duration)] = 1
+
+    created = datetime.fromisoformat(job['created_at'])
+    key = [job['user_id'], created.date().isoformat(), created.hour, job['status'], job['repo_url']]
+    existing = db.run("""
+        select duration_hist from job_rollups
+         where user_id is ? and day = ? and hour = ? and status = ? and repo_url = ?""", key)
+    if existing:
+        merged = [a + b for a, b in zip(json.loads(existing[0]['duration_hist']), hist)]
+        db.run("""
+            update job_rollups
+               set job_count = job_count + 1, duration_count = duration_count + ?,
+                   duration_sum = duration_sum + ?, duration_hist = ?
+             where user_id is ? and day = ? and hour = ? and status = ? and repo_url = ?""",
+               [int(duration is not None), duration or 0, json.dumps(merged)] + key)
+    else:
+        db.run("""
+            insert into job_rollups (user_id, day, hour, status, repo_url, job_count,
+                                     duration_count, duration_sum, duration_hist)
+            values (?, ?, ?, ?, ?, 1, ?, ?, ?)""", key + [int(duration is not None), duration or 0, json.dumps(hist)])
+    return []
+
+def _duration(started_at, finished_at):
+    if not started_at or not finished_at:
+        return None
+    return (datetime.fromisoformat(finished_at) - datetime.fromisoformat(started_at)).total_seconds()
+
+def _bucket(duration):
+    from services.analytics import DURATION_BUCKETS
+    return next(i for i, bound in enumerate(DURATION_BUCKETS) if duration <= bound)
+
+def _retract_hist(hist, started_at, finished_at):
+    """duration_hist with a deleted job's bucket taken back out"""
+    duration = _duration(started_at, finished_at)
+    if duration is None:
+        return hist
+    counts = json.loads(hist)
+    counts[_bucket(duration)] -= 1
+    return json.dumps(counts)
+
+def rebuild_job_rollups(db):
+    db.run('delete from job_rollups', [])
+    db.run('update jobs set rolled_up = 0 where rolled_up', [])
+    for row in db.run("select id from jobs where status in ('success', 'failed', 'cancelled')", []):
+        record_job_rollup(db, row['id'])
+    return []
+
+FUNCTIONS = {
+    'claim_job': claim_job,
+    'renew_job_leases': renew_job_leases,
+    'record_job_rollup': record_job_rollup,
+    'rebuild_job_rollups': rebuild_job_rollups
+}
@@ -0,0 +1,17 @@
+import os
+import tempfile
+
+# config.py opens the storage backend on import, so point it at a throwaway SQLite file first
+os.environ.setdefault('STORAGE_BACKEND', 'sqlite')
+os.environ.setdefault('SQLITE_PATH', os.path.join(tempfile.mkdtemp(), 'ci.db'))
+
+import pytest
+
+from storage.sqlite import SqliteClient
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh SQLite database with the schema applied"""
+    client = SqliteClient(str(tmp_path / 'ci.db'))
+    yield client
+    client.conn.close()
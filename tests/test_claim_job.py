@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+def _ago(seconds):
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat()
+
+def _job(db, age=60, **values):
+    row = {'repo_url': 'https://example.com/repo.git', 'status': 'pending', 'created_at': _ago(age), **values}
+    return db.table('jobs').insert(row).execute().data[0]['id']
+
+def _claim(db, **params):
+    rows = db.rpc('claim_job', {'p_worker': 'w1', 'p_lease_seconds': 60, **params}).execute().data
+    return rows[0]['id'] if rows else None
+
+def _get(db, job_id):
+    return db.table('jobs').select('*').eq('id', job_id).execute().data[0]
+
+def test_claims_oldest_pending_job_once(db):
+    newer = _job(db, age=10)
+    older = _job(db, age=20)
+
+    assert _claim(db) == older
+    job = _get(db, older)
+    assert (job['status'], job['lease_owner'], job['attempts']) == ('running', 'w1', 1)
+    assert _claim(db) == newer
+    assert _claim(db) is None
+
+def test_labels_must_all_be_offered(db):
+    gpu = _job(db, labels=['gpu', 'python'])
+
+    assert _claim(db, p_labels=['python']) is None
+    assert _claim(db, p_labels=[]) is None
+    assert _claim(db, p_labels=['gpu', 'node', 'python']) == gpu
+
+def test_unlabelled_jobs_go_anywhere_and_null_labels_take_everything(db):
+    plain = _job(db, age=20)
+    labelled = _job(db, age=10, labels=['node'])
+
+    assert _claim(db, p_labels=['python']) == plain
+    assert _claim(db, p_labels=['python']) is None
+    assert _claim(db, p_labels=None) == labelled
+
+def test_jobs_larger_than_free_capacity_are_passed_over(db):
+    big = _job(db, age=20, cpus=4, memory_mb=8192)
+    small = _job(db, age=10, cpus=1, memory_mb=1024)
+
+    assert _claim(db, p_max_cpus=2, p_max_memory_mb=16384) == small
+    assert _claim(db, p_max_cpus=8, p_max_memory_mb=4096) is None
+    assert _claim(db, p_max_cpus=4, p_max_memory_mb=8192) == big
+
+def test_starved_head_job_holds_back_smaller_ones(db):
+    big = _job(db, age=600, cpus=4)
+    small = _job(db, age=10, cpus=1)
+    capacity = {'p_total_cpus': 4, 'p_total_memory_mb': 16384, 'p_starve_seconds': 300}
+
+    # Waiting past p_starve_seconds, the big job reserves the runner until it fits
+    assert _claim(db, p_max_cpus=2, **capacity) is None
+    assert _claim(db, p_max_cpus=4, **capacity) == big
+    assert _claim(db, p_max_cpus=2, **capacity) == small
+
+def test_starvation_ignores_jobs_this_runner_could_never_run(db):
+    _job(db, age=600, cpus=16)
+    small = _job(db, age=10, cpus=1)
+
+    assert _claim(db, p_max_cpus=2, p_total_cpus=4, p_starve_seconds=300) == small
+
+def test_young_head_job_does_not_block(db):
+    _job(db, age=60, cpus=4)
+    small = _job(db, age=10, cpus=1)
+
+    assert _claim(db, p_max_cpus=2, p_total_cpus=4, p_starve_seconds=300) == small
+
+def test_not_before_delays_the_job(db):
+    later = _job(db, age=20, not_before=(datetime.now(timezone.utc) + timedelta(minutes=5)).isoformat())
+    due = _job(db, age=10, not_before=_ago(1))
+
+    assert _claim(db) == due
+    assert _claim(db) is None
+    db.table('jobs').update({'not_before': _ago(1)}).eq('id', later).execute()
+    assert _claim(db) == later
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(db):
+    job_id = _job(db, status='running', lease_owner='gone', lease_expires_at=_ago(5), attempts=1)
+
+    assert _claim(db, p_max_attempts=2) == job_id
+    assert _get(db, job_id)['attempts'] == 2
+
+    db.table('jobs').update({'lease_expires_at': _ago(5)}).eq('id', job_id).execute()
+    assert _claim(db, p_max_attempts=2) is None
+    job = _get(db, job_id)
+    assert (job['status'], job['lease_owner'], job['rolled_up']) == ('failed', None, True)
+
+def test_live_lease_is_not_taken(db):
+    _job(db, status='running', lease_owner='other',
+         lease_expires_at=(datetime.now(timezone.utc) + timedelta(minutes=1)).isoformat())
+
+    assert _claim(db) is None
@@ -0,0 +1,58 @@
+import pytest
+
+from services import log_archive, log_store
+
+@pytest.fixture
+def job(db, monkeypatch):
+    """A job with 25 log lines, read through log_store on the test database"""
+    monkeypatch.setattr(log_store, 'supabase', db)
+    monkeypatch.setattr(log_archive, 'supabase', db)
+    monkeypatch.setattr(log_archive, 'LOG_ARCHIVE_CHUNK_LINES', 10)
+    job_id = db.table('jobs').insert({'repo_url': 'https://example.com/repo.git', 'status': 'success'})\
+        .execute().data[0]['id']
+    db.table('job_logs').insert([{'job_id': job_id, 'message': f'line {i}'} for i in range(25)]).execute()
+    return job_id
+
+def _messages(lines):
+    return [line['message'] for line in lines]
+
+def _seqs(db, job_id):
+    return [row['seq'] for row in db.table('job_logs').select('seq').eq('job_id', job_id).order('seq').execute().data]
+
+@pytest.mark.parametrize('after_index, limit', [(None, 1000), (None, 7), (4, 10), (9, 3), (12, 100), (24, 10)])
+def test_archived_pages_match_live_pages(db, job, after_index, limit):
+    seqs = _seqs(db, job)
+    after = None if after_index is None else seqs[after_index]
+    live = log_store.fetch_logs(job, after=after, limit=limit)
+
+    log_archive.archive_job(job)
+    archived = log_store.fetch_logs(job, after=after, limit=limit, archived=True)
+
+    assert _messages(archived) == _messages(live)
+    assert [line['seq'] for line in archived] == [line['seq'] for line in live]
+
+@pytest.mark.parametrize('tail', [1, 5, 10, 15, 25, 40])
+def test_archived_tail_matches_live_tail(db, job, tail):
+    live = log_store.fetch_logs(job, tail=tail)
+    log_archive.archive_job(job)
+    assert _messages(log_store.fetch_logs(job, tail=tail, archived=True)) == _messages(live)
+
+def test_paging_with_the_last_seq_walks_every_chunk(db, job):
+    log_archive.archive_job(job)
+    assert db.table('job_logs').select('seq').eq('job_id', job).execute().data == []
+    assert len(db.table('job_log_chunks').select('chunk').eq('job_id', job).execute().data) == 3
+
+    pages, after = [], None
+    while True:
+        page = log_store.fetch_logs(job, after=after, limit=4, archived=True)
+        if not page:
+            break
+        pages.append(_messages(page))
+        after = page[-1]['seq']
+    assert [message for page in pages for message in page] == [f'line {i}' for i in range(25)]
+    assert [len(page) for page in pages] == [4, 4, 4, 4, 4, 4, 1]
+
+def test_archiving_twice_is_harmless(db, job):
+    log_archive.archive_job(job)
+    log_archive.archive_job(job)
+    assert _messages(log_store.fetch_logs(job, archived=True)) == [f'line {i}' for i in range(25)]
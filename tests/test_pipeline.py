@@ -0,0 +1,75 @@
+import re
+import threading
+
+import pytest
+
+from services.pipeline import parse_steps, run_steps
+
+def test_commands_become_one_unnamed_step():
+    assert parse_steps({'commands': ['make', 'make test']}) == [
+        {'name': None, 'commands': ['make', 'make test'], 'needs': []}
+    ]
+
+def test_steps_accept_strings_run_and_commands():
+    steps = parse_steps({'steps': [
+        'echo one',
+        {'name': 'build', 'run': 'make'},
+        {'name': 'test', 'commands': ['make test', 'make lint'], 'needs': 'build'}
+    ]})
+    assert steps == [
+        {'name': 'step-1', 'commands': ['echo one'], 'needs': []},
+        {'name': 'build', 'commands': ['make'], 'needs': []},
+        {'name': 'test', 'commands': ['make test', 'make lint'], 'needs': ['build']}
+    ]
+
+@pytest.mark.parametrize('steps, message', [
+    ([{'name': 'a', 'run': 'x'}, {'name': 'a', 'run': 'y'}], 'Duplicate step names: a'),
+    ([{'name': 'a', 'run': 'x', 'needs': ['missing']}], 'needs unknown step(s): missing'),
+    ([{'name': 'a', 'run': 'x', 'needs': [1]}], 'needs must be a step name'),
+    ([{'name': 'a', 'run': 'x', 'needs': 'b'}, {'name': 'b', 'run': 'y', 'needs': 'a'}],
+     'dependency cycle: a, b'),
+])
+def test_malformed_steps_are_rejected(steps, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        parse_steps({'steps': steps})
+
+def _steps(*specs):
+    return [{'name': name, 'commands': [], 'needs': list(needs)} for name, needs in specs]
+
+def test_steps_run_after_their_needs():
+    order = []
+
+    def run_step(step, abort):
+        order.append(step['name'])
+        return True
+
+    results = run_steps(_steps(('test', ['build']), ('build', []), ('deploy', ['test'])), run_step)
+    assert order == ['build', 'test', 'deploy']
+    assert results == {'build': 'success', 'test': 'success', 'deploy': 'success'}
+
+def test_failed_need_skips_dependents_without_fail_fast():
+    results = run_steps(_steps(('build', []), ('test', ['build']), ('lint', [])),
+                        lambda step, abort: step['name'] != 'build', fail_fast=False)
+    assert results == {'build': 'failed', 'test': 'skipped', 'lint': 'success'}
+
+def test_fail_fast_sets_abort_and_cancels_running_steps():
+    started = threading.Event()
+    aborted = []
+
+    def run_step(step, abort):
+        if step['name'] == 'slow':
+            started.set()
+            # A step checks abort between commands; here it just waits for it
+            return not abort.wait(5)
+        started.wait(5)
+        return False
+
+    results = run_steps(_steps(('slow', []), ('bad', []), ('later', ['bad'])), run_step,
+                        max_parallel=2, on_abort=lambda: aborted.append(True))
+    assert results == {'slow': 'cancelled', 'bad': 'failed', 'later': 'skipped'}
+    assert aborted == [True]
+
+def test_should_stop_skips_steps_not_yet_started():
+    results = run_steps(_steps(('a', []), ('b', ['a'])), lambda step, abort: True,
+                        should_stop=lambda: True)
+    assert results == {'a': 'skipped', 'b': 'skipped'}
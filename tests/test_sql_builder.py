@@ -0,0 +1,96 @@
+import pytest
+
+def _runners(db, *names):
+    return db.table('runners').insert([{'name': name, 'cpus': i + 1, 'memory_mb': 1024 * (i + 1)}
+                                       for i, name in enumerate(names)]).execute().data
+
+def _names(result):
+    return [row['name'] for row in result.data]
+
+def test_insert_returns_rows_with_generated_keys_and_decoded_types(db):
+    row = db.table('runners').insert({'name': 'a', 'labels': ['python']}).execute().data[0]
+
+    assert len(row['id']) == 36
+    assert row['labels'] == ['python']
+    assert row['created_at'].endswith('+00:00')
+
+def test_comparison_filters_order_and_limit(db):
+    _runners(db, 'a', 'b', 'c', 'd')
+    runners = db.table('runners')
+
+    assert _names(runners.select('name').eq('name', 'b').execute()) == ['b']
+    assert _names(db.table('runners').select('name').neq('name', 'b').order('name').execute()) == ['a', 'c', 'd']
+    assert _names(db.table('runners').select('name').gt('cpus', 1).lte('cpus', 3).order('cpus', desc=True)
+                  .execute()) == ['c', 'b']
+    assert _names(db.table('runners').select('name').gte('cpus', 2).lt('cpus', 4).order('name').limit(1)
+                  .execute()) == ['b']
+
+def test_in_filter_and_empty_in(db):
+    _runners(db, 'a', 'b', 'c')
+
+    assert _names(db.table('runners').select('name').in_('name', ['a', 'c']).order('name').execute()) == ['a', 'c']
+    assert db.table('runners').select('name').in_('name', []).execute().data == []
+
+def test_is_and_or_logic_trees(db):
+    rows = _runners(db, 'a', 'b', 'c')
+    db.table('runners').update({'cpus': None}).eq('name', 'a').execute()
+
+    assert _names(db.table('runners').select('name').is_('cpus', 'null').execute()) == ['a']
+    assert _names(db.table('runners').select('name').or_('cpus.is.null,and(cpus.eq.3,name.eq."c")')
+                  .order('name').execute()) == ['a', 'c']
+    # Keyset-style cursor, as the jobs list uses
+    cursor = rows[1]['created_at']
+    assert _names(db.table('runners').select('name')
+                  .or_(f'created_at.gt.{cursor},and(created_at.eq.{cursor},name.gt.b)')
+                  .order('created_at').execute()) == ['c']
+
+def test_count_and_head(db):
+    _runners(db, 'a', 'b', 'c')
+
+    result = db.table('runners').select('name', count='exact').gt('cpus', 1).limit(1).execute()
+    assert (result.count, len(result.data)) == (2, 1)
+    result = db.table('runners').select('*', count='exact', head=True).execute()
+    assert (result.count, result.data) == (3, [])
+
+def test_update_and_delete_return_affected_rows(db):
+    _runners(db, 'a', 'b')
+
+    updated = db.table('runners').update({'labels': ['node']}).eq('name', 'a').execute().data
+    assert [(row['name'], row['labels']) for row in updated] == [('a', ['node'])]
+    assert _names(db.table('runners').delete().eq('name', 'b').execute()) == ['b']
+    assert _names(db.table('runners').select('name').execute()) == ['a']
+
+def test_upsert_updates_or_ignores_conflicts(db):
+    key = {'repo_url': 'r', 'commit_sha': 'abc', 'config_hash': 'h'}
+    db.table('build_cache').upsert({**key, 'job_id': None}, on_conflict='repo_url,commit_sha,config_hash').execute()
+    job_id = db.table('jobs').insert({'repo_url': 'r'}).execute().data[0]['id']
+
+    ignored = db.table('build_cache').upsert({**key, 'job_id': job_id}, on_conflict='repo_url,commit_sha,config_hash',
+                                             ignore_duplicates=True).execute().data
+    assert ignored == []
+    updated = db.table('build_cache').upsert({**key, 'job_id': job_id},
+                                             on_conflict='repo_url,commit_sha,config_hash').execute().data
+    assert [row['job_id'] for row in updated] == [job_id]
+    assert len(db.table('build_cache').select('*').execute().data) == 1
+
+def test_observers_see_each_query(db):
+    seen = []
+    db.observers.append(lambda table, operation, seconds: seen.append((table, operation)))
+
+    _runners(db, 'a')
+    db.table('runners').select('*').execute()
+    db.rpc('renew_job_leases', {'p_worker': 'w', 'p_lease_seconds': 1}).execute()
+    assert seen == [('runners', 'insert'), ('runners', 'select'), ('renew_job_leases', 'rpc')]
+
+@pytest.mark.parametrize('build', [
+    lambda db: db.table('runners; drop table jobs'),
+    lambda db: db.table('runners').select('name, id; --'),
+    lambda db: db.table('runners').order('name desc'),
+    lambda db: db.table('runners').or_('name.like.a*'),
+    lambda db: db.table('runners').is_('name', 'maybe'),
+    lambda db: db.table('runners').upsert({'name': 'a'}),
+    lambda db: db.rpc('claim_job', {'p_worker; --': 'w'}).execute(),
+])
+def test_unsafe_or_unsupported_input_is_rejected(db, build):
+    with pytest.raises(ValueError):
+        build(db)